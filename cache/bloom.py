@@ -0,0 +1,53 @@
+"""
+Compact Bloom filter used as a negative fast-path in front of the cache tiers
+"""
+import math
+import hashlib
+from typing import Iterable
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over string keys"""
+    
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        # Optimal bit count and number of hash functions for the target error rate
+        self.capacity = capacity
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+        
+    def _positions(self, key: str) -> Iterable[int]:
+        """
+        Derive bit positions for a key using double hashing
+        
+        Args:
+            key: Key to hash
+            
+        Returns:
+            Iterable of bit positions
+        """
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.num_bits for i in range(self.num_hashes))
+        
+    def add(self, key: str) -> None:
+        """
+        Add a key to the filter
+        
+        Args:
+            key: Key to add
+        """
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+        
+    def __contains__(self, key: str) -> bool:
+        # A negative answer is definitive; a positive one may be a false positive
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+        
+    def clear(self) -> None:
+        """Reset the filter to empty"""
+        self.bits = bytearray(len(self.bits))
+        self.count = 0
@@ -0,0 +1,33 @@
+"""
+diskcache storage backend with zstd compression for large text values
+"""
+import zstandard
+from diskcache import Disk
+from diskcache.core import UNKNOWN
+
+from config.settings import DISK_CACHE_COMPRESS_MIN_BYTES, DISK_CACHE_COMPRESS_LEVEL
+
+# Prefix marking a compressed payload, followed by a type byte ('s' str / 'b' bytes)
+_MAGIC = b"\x00zst"
+
+
+class ZstdDisk(Disk):
+    """Compresses str/bytes values above a size threshold before storing them"""
+    
+    def store(self, value, read, key=UNKNOWN):
+        if not read and isinstance(value, (str, bytes)):
+            raw = value.encode("utf-8") if isinstance(value, str) else value
+            if len(raw) >= DISK_CACHE_COMPRESS_MIN_BYTES:
+                type_byte = b"s" if isinstance(value, str) else b"b"
+                compressed = zstandard.ZstdCompressor(level=DISK_CACHE_COMPRESS_LEVEL).compress(raw)
+                value = _MAGIC + type_byte + compressed
+        return super().store(value, read, key=key)
+        
+    def fetch(self, mode, filename, value, read):
+        data = super().fetch(mode, filename, value, read)
+        # Values written before compression was enabled come back unchanged
+        if not read and isinstance(data, bytes) and data.startswith(_MAGIC):
+            type_byte = data[len(_MAGIC):len(_MAGIC) + 1]
+            raw = zstandard.ZstdDecompressor().decompress(data[len(_MAGIC) + 1:])
+            return raw.decode("utf-8") if type_byte == b"s" else raw
+        return data
@@ -2,15 +2,53 @@
 Comprehensive caching system with multiple cache levels
 """
 import os
-import json
+import sys
 import time
-import hashlib
-from typing import Dict, Any, Optional, List, Tuple
+import atexit
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Any, Optional, List, Tuple, FrozenSet
 
-from cachetools import TTLCache
+import orjson
+import xxhash
+from cachetools import TTLCache, LRUCache
 from diskcache import Cache
 
-from config.settings import CACHE_DIR, CACHE_TTL
+from cache.bloom import BloomFilter
+from cache.disk import ZstdDisk
+from cache.metrics import CountingCache
+from core.executor import run_in_thread
+from config.settings import (
+    CACHE_DIR,
+    MEMORY_CACHE_SIZE,
+    CACHE_TTL,
+    MAX_CACHE_TTL,
+    SIMILAR_QUERY_TTL,
+    CACHE_TTL_HIT_FACTOR,
+    NEGATIVE_CACHE_TTL,
+    BLOOM_CAPACITY,
+    BLOOM_ERROR_RATE,
+    CACHE_FLUSH_INTERVAL
+)
+
+# Minimum number of log lines before a query log is considered for compaction
+QUERY_LOG_COMPACT_MIN_LINES = 100
+
+# Threads used to read legacy per-query files during migration
+LEGACY_LOAD_WORKERS = 8
+
+@dataclass(slots=True, frozen=True)
+class QueryEntry:
+    """Metadata for one cached query in a video's query index"""
+    video_id: str
+    query: str
+    response: Optional[str]  # Only set for legacy entries; otherwise held in the cache tiers
+    timestamp: float
+    words: FrozenSet[str]
+
 
 class CacheManager:
     """Manages multi-level caching for improved performance"""
@@ -24,15 +62,57 @@ class CacheManager:
         for dir_path in [self.video_cache_dir, self.query_cache_dir]:
             os.makedirs(dir_path, exist_ok=True)
         
-        # Memory cache (fastest, limited size)
-        self.memory_cache = TTLCache(maxsize=1000, ttl=CACHE_TTL)
+        # Memory cache (fastest, limited size); per-key lifetimes are read from
+        # _memory_ttls on insertion so an entry never outlives its disk copy
+        self._memory_ttls: Dict[str, float] = {}
+        self.memory_cache = CountingCache(
+            maxsize=MEMORY_CACHE_SIZE,
+            ttu=self._memory_ttu,
+            evicted_capacity=MEMORY_CACHE_SIZE * 10
+        )
+        
+        # The engine is shared by every Streamlit session thread; cachetools caches
+        # and the query index dicts are not thread-safe, so public entry points
+        # hold this lock (reentrant: lookups load the query index while holding it)
+        self._lock = threading.RLock()
         
-        # Disk cache (slower, persistent)
-        self.disk_cache = Cache(os.path.join(self.cache_base, "diskcache"))
+        # Hit counts driving adaptive TTL extension of popular entries
+        self.hit_counts = LRUCache(maxsize=10000)
+        # Keys answered by a similar query; they keep their short TTL and are never extended.
+        # On disk these entries carry the 'similar' tag instead of 'resp', and disk reads
+        # re-mark them, so this only needs to cover entries the memory tier can hold
+        self._similar_keys = TTLCache(maxsize=MEMORY_CACHE_SIZE, ttl=SIMILAR_QUERY_TTL)
+        
+        # Short-lived negative results so repeated misses skip every tier
+        self.negative_cache = TTLCache(maxsize=1000, ttl=NEGATIVE_CACHE_TTL)
+        
+        # Disk cache (slower, persistent); large values are zstd-compressed
+        self.disk_cache = Cache(os.path.join(self.cache_base, "diskcache"), disk=ZstdDisk)
         
         # Track embeddings for semantic similarity
         self.embedding_cache = {}
         
+        # Per-video query index loaded lazily from queries/{video_id}.jsonl
+        # {video_id: {query_hash: QueryEntry}}
+        self.query_index: Dict[str, Dict[str, QueryEntry]] = {}
+        self.query_log_lines: Dict[str, int] = {}
+        # Inverted word index per video so similarity search only visits
+        # cached queries sharing at least one word: {video_id: {word: {query_hash}}}
+        self.query_postings: Dict[str, Dict[str, set]] = {}
+        
+        # Bloom filters over processed videos and cached (video_id, query_hash) keys;
+        # a miss is definitive and skips the slower cache tiers
+        self.video_bloom = BloomFilter(BLOOM_CAPACITY, BLOOM_ERROR_RATE)
+        self.query_bloom = BloomFilter(BLOOM_CAPACITY, BLOOM_ERROR_RATE)
+        self._rebuild_bloom_filters()
+        
+        # File-tier writes are buffered and flushed in batches by a background timer;
+        # entries are (mode, path, bytes) with mode 'a' (append) or 'w' (replace)
+        self._pending_writes: deque = deque()
+        self._write_lock = threading.Lock()
+        self._flush_timer: Optional[threading.Timer] = None
+        atexit.register(self.flush)
+        
     def has_processed_video(self, video_id: str) -> bool:
         """
         Check if a video has been processed and cached
@@ -43,37 +123,28 @@ class CacheManager:
         Returns:
             True if video is cached and valid
         """
-        # Check memory cache first (fastest)
-        memory_key = f"video_processed:{video_id}"
-        if memory_key in self.memory_cache:
-            return True
+        with self._lock:
+            # Bloom filter miss means the video was never marked processed
+            if video_id not in self.video_bloom:
+                return False
             
-        # Check disk cache next
-        if self.disk_cache.get(memory_key, default=None):
-            # Refresh memory cache
-            self.memory_cache[memory_key] = True
-            return True
-            
-        # Finally check file cache
-        video_path = os.path.join(self.video_cache_dir, f"{video_id}.json")
-        if not os.path.exists(video_path):
-            return False
+            # Check memory cache first (fastest)
+            memory_key = f"video_processed:{video_id}"
+            if self.memory_cache.get(memory_key):
+                return True
             
-        # Check if cache is still valid
-        try:
-            with open(video_path, 'r') as f:
-                data = json.load(f)
-                
-            cache_time = data.get('timestamp', 0)
-            is_valid = (time.time() - cache_time) < CACHE_TTL
+            # Recently confirmed miss
+            if f"neg:{memory_key}" in self.negative_cache:
+                return False
             
-            # Update memory cache with result
-            if is_valid:
+            # Check disk cache next
+            if self.disk_cache.get(memory_key, default=None):
+                # Refresh memory cache
                 self.memory_cache[memory_key] = True
-                self.disk_cache.set(memory_key, True, expire=CACHE_TTL)
-                
-            return is_valid
-        except:
+                return True
+            
+            # The marker file is only a backup, restored into the disk cache on startup
+            self.negative_cache[f"neg:{memory_key}"] = False
             return False
         
     def mark_video_processed(self, video_id: str) -> None:
@@ -83,19 +154,21 @@ class CacheManager:
         Args:
             video_id: Unique video identifier
         """
-        # Update all cache levels
-        memory_key = f"video_processed:{video_id}"
-        self.memory_cache[memory_key] = True
-        self.disk_cache.set(memory_key, True, expire=CACHE_TTL)
+        with self._lock:
+            # Update all cache levels
+            memory_key = f"video_processed:{video_id}"
+            self.video_bloom.add(video_id)
+            self.negative_cache.pop(f"neg:{memory_key}", None)
+            self.memory_cache[memory_key] = True
+            self.disk_cache.set(memory_key, True, expire=CACHE_TTL)
         
-        # Update file cache
-        video_path = os.path.join(self.video_cache_dir, f"{video_id}.json")
-        with open(video_path, 'w') as f:
-            json.dump({
+            # Update backup marker file (deferred)
+            video_path = os.path.join(self.video_cache_dir, f"{video_id}.json")
+            self._queue_write('w', video_path, orjson.dumps({
                 'video_id': video_id,
                 'timestamp': time.time(),
                 'processed': True
-            }, f)
+            }))
     
     def get_cached_response(self, video_id: str, query: str) -> Optional[str]:
         """
@@ -108,49 +181,47 @@ class CacheManager:
         Returns:
             Cached response or None if not found
         """
-        # Normalize query (lowercase, remove extra whitespace)
-        normalized_query = ' '.join(query.lower().split())
+        with self._lock:
+            # Normalize query (lowercase, remove extra whitespace)
+            normalized_query = ' '.join(query.lower().split())
         
-        # Create cache keys
-        query_hash = self._hash_query(normalized_query)
-        memory_key = f"query:{video_id}:{query_hash}"
+            # Create cache keys
+            query_hash = self._hash_query(normalized_query)
+            memory_key = f"query:{video_id}:{query_hash}"
         
-        # Check memory cache first (fastest)
-        if memory_key in self.memory_cache:
-            return self.memory_cache[memory_key]
-            
-        # Check disk cache next
-        disk_result = self.disk_cache.get(memory_key, default=None)
-        if disk_result:
-            # Refresh memory cache
-            self.memory_cache[memory_key] = disk_result
-            return disk_result
-            
-        # Finally check file cache
-        query_path = os.path.join(self.query_cache_dir, f"{video_id}_{query_hash}.json")
-        if not os.path.exists(query_path):
-            return self._check_similar_queries(video_id, normalized_query)
-            
-        # Load from file cache
-        try:
-            with open(query_path, 'r') as f:
-                data = json.load(f)
-                
-            cache_time = data.get('timestamp', 0)
-            if (time.time() - cache_time) < CACHE_TTL:
-                response = data.get('response', None)
-                
-                # Update faster caches
+            # Recently confirmed miss (including the similar-query check)
+            if f"neg:{memory_key}" in self.negative_cache:
+                return None
+        
+            # Memory and disk tiers can only hold keys the Bloom filter has seen
+            if memory_key in self.query_bloom:
+                response = self._lookup_response(memory_key)
                 if response:
-                    self.memory_cache[memory_key] = response
+                    return response
+            
+            # Finally fall back to responses carried by legacy query index entries;
+            # current entries keep only metadata and store the response in diskcache
+            entry = self._get_query_index(video_id).get(query_hash)
+            if entry:
+                response = entry.response
+                if (time.time() - entry.timestamp) < CACHE_TTL and response:
+                    # Update faster caches
+                    self.query_bloom.add(memory_key)
+                    self._set_memory(memory_key, response)
                     self.disk_cache.set(memory_key, response, expire=CACHE_TTL)
-                    
-                return response
-        except:
-            pass
+                    return response
             
-        # No valid cache found
-        return self._check_similar_queries(video_id, normalized_query)
+            # No valid cache found
+            response = self._check_similar_queries(video_id, normalized_query)
+            if response is None:
+                self.negative_cache[f"neg:{memory_key}"] = None
+            else:
+                # Remember the paraphrase briefly so near-miss matches don't stick
+                self.query_bloom.add(memory_key)
+                self._similar_keys[memory_key] = True
+                self._set_memory(memory_key, response, SIMILAR_QUERY_TTL)
+                self.disk_cache.set(memory_key, response, expire=SIMILAR_QUERY_TTL, tag='similar')
+            return response
     
     def _check_similar_queries(self, video_id: str, query: str) -> Optional[str]:
         """
@@ -167,53 +238,41 @@ class CacheManager:
         # In a real implementation, you would use embeddings here
         
         try:
-            # Get all cached queries for this video
-            query_files = [f for f in os.listdir(self.query_cache_dir) 
-                         if f.startswith(f"{video_id}_") and f.endswith(".json")]
+            query_words = frozenset(query.split())
+            threshold = 0.5  # Threshold for similarity
+            matches = []
+            now = time.time()
             
-            # Extract query text from each file
-            cached_queries = []
-            for qf in query_files:
-                try:
-                    with open(os.path.join(self.query_cache_dir, qf), 'r') as f:
-                        data = json.load(f)
-                        original_query = data.get('query', '')
-                        response = data.get('response', '')
-                        timestamp = data.get('timestamp', 0)
-                        
-                        # Skip expired items
-                        if (time.time() - timestamp) >= CACHE_TTL:
-                            continue
-                            
-                        if original_query and response:
-                            cached_queries.append((original_query, response, qf))
-                except:
-                    continue
+            index = self._get_query_index(video_id)
+            postings = self.query_postings.get(video_id, {})
             
-            # Find the most similar query
-            if cached_queries:
-                query_words = set(query.split())
-                best_match = None
-                best_score = 0.5  # Threshold for similarity
+            # Jaccard > 0 requires a shared word, so gather candidates from the postings
+            candidates = set()
+            for word in query_words:
+                candidates.update(postings.get(word, ()))
+            
+            for query_hash in candidates:
+                entry = index.get(query_hash)
+                if not entry:
+                    continue
+                # Skip expired items
+                if (now - entry.timestamp) >= CACHE_TTL:
+                    continue
                 
-                for cached_query, response, filename in cached_queries:
-                    cached_words = set(cached_query.lower().split())
-                    
-                    # Calculate Jaccard similarity
-                    if not cached_words or not query_words:
-                        continue
-                        
-                    intersection = len(query_words.intersection(cached_words))
-                    union = len(query_words.union(cached_words))
-                    
-                    if union > 0:
-                        similarity = intersection / union
-                        if similarity > best_score:
-                            best_score = similarity
-                            best_match = (cached_query, response)
+                # Calculate Jaccard similarity on the precomputed word sets
+                intersection = len(query_words & entry.words)
+                union = len(query_words) + len(entry.words) - intersection
                 
-                if best_match:
-                    return best_match[1]
+                if union > 0:
+                    similarity = intersection / union
+                    if similarity > threshold:
+                        matches.append((similarity, query_hash, entry.response))
+            
+            # Resolve the best match whose response is still cached
+            for _, query_hash, response in sorted(matches, key=lambda m: m[0], reverse=True):
+                response = response or self._lookup_response(f"query:{video_id}:{query_hash}")
+                if response:
+                    return response
         except Exception as e:
             print(f"Error in similar query check: {e}")
             
@@ -228,26 +287,365 @@ class CacheManager:
             query: User query
             response: Response to cache
         """
-        # Normalize query
-        normalized_query = ' '.join(query.lower().split())
+        with self._lock:
+            # Normalize query
+            normalized_query = ' '.join(query.lower().split())
         
-        # Create cache keys
-        query_hash = self._hash_query(normalized_query)
-        memory_key = f"query:{video_id}:{query_hash}"
+            # Create cache keys
+            query_hash = self._hash_query(normalized_query)
+            memory_key = f"query:{video_id}:{query_hash}"
         
-        # Update all cache levels
-        self.memory_cache[memory_key] = response
-        self.disk_cache.set(memory_key, response, expire=CACHE_TTL)
+            # A new entry can satisfy earlier misses for this video via similarity
+            neg_prefix = f"neg:query:{video_id}:"
+            for key in [k for k in self.negative_cache if k.startswith(neg_prefix)]:
+                self.negative_cache.pop(key, None)
         
-        # Update file cache
-        query_path = os.path.join(self.query_cache_dir, f"{video_id}_{query_hash}.json")
-        with open(query_path, 'w') as f:
-            json.dump({
-                'video_id': video_id,
+            # Update all cache levels
+            self.query_bloom.add(memory_key)
+            self._similar_keys.pop(memory_key, None)
+            self.memory_cache[memory_key] = response
+            self.disk_cache.set(memory_key, response, expire=CACHE_TTL, tag='resp')
+        
+            # Update the query index and append its metadata to the log;
+            # the response payload itself lives only in the cache tiers
+            timestamp = time.time()
+            index = self._get_query_index(video_id)
+            self._add_to_query_index(video_id, query_hash, normalized_query, None, timestamp)
+        
+            self._queue_write('a', self._query_log_path(video_id), orjson.dumps({
                 'query': normalized_query,
-                'response': response,
-                'timestamp': time.time()
-            }, f)
+                'timestamp': timestamp
+            }, option=orjson.OPT_APPEND_NEWLINE))
+            self.query_log_lines[video_id] = self.query_log_lines.get(video_id, 0) + 1
+        
+            # Periodically compact the log once it is mostly superseded lines
+            if self.query_log_lines[video_id] > max(QUERY_LOG_COMPACT_MIN_LINES, 2 * len(index)):
+                self._compact_query_log(video_id)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Report memory cache effectiveness for sizing the cache
+        
+        Returns:
+            Dict with hit/miss/just-missed/eviction counters and current sizes
+        """
+        with self._lock:
+            stats = dict(self.memory_cache.stats)
+            lookups = stats["hits"] + stats["misses"]
+            stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0.0
+            stats["size"] = len(self.memory_cache)
+            stats["maxsize"] = self.memory_cache.maxsize
+            return stats
+    
+    async def preload_query_index(self, video_id: str) -> None:
+        """
+        Load a video's query index off the event loop so later lookups stay in memory
+        
+        Args:
+            video_id: Unique video identifier
+        """
+        if video_id not in self.query_index:
+            await run_in_thread(self._get_query_index, video_id)
+    
+    def _lookup_response(self, memory_key: str) -> Optional[str]:
+        """
+        Fetch a response payload from the memory or disk cache tier
+        
+        Args:
+            memory_key: Query cache key
+            
+        Returns:
+            Cached response or None if not found
+        """
+        # Check memory cache first (fastest)
+        memory_result = self.memory_cache.get(memory_key)
+        if memory_result:
+            self._record_hit(memory_key)
+            return memory_result
+            
+        # Check disk cache next
+        disk_result, expire_time, tag = self.disk_cache.get(
+            memory_key, default=None, expire_time=True, tag=True
+        )
+        if disk_result:
+            if tag == 'similar':
+                self._similar_keys[memory_key] = True
+            self._record_hit(memory_key)
+            # Refresh memory cache for no longer than the disk entry lives
+            remaining = expire_time - time.time() if expire_time else CACHE_TTL
+            self._set_memory(memory_key, disk_result, remaining)
+            return disk_result
+        return None
+    
+    def _record_hit(self, memory_key: str) -> None:
+        """
+        Count a cache hit and extend the disk TTL of frequently hit entries
+        
+        Args:
+            memory_key: Query cache key
+        """
+        hits = self.hit_counts.get(memory_key, 0) + 1
+        self.hit_counts[memory_key] = hits
+        
+        # Paraphrase matches keep their short TTL so noisy matches don't stick
+        if memory_key in self._similar_keys:
+            return
+        
+        # Touch on the 1st, 2nd, 4th, 8th... hit to keep disk writes rare
+        if hits & (hits - 1) == 0:
+            ttl = min(MAX_CACHE_TTL, CACHE_TTL * (1 + hits * CACHE_TTL_HIT_FACTOR))
+            self.disk_cache.touch(memory_key, expire=ttl)
+    
+    def _set_memory(self, key: str, value: Any, ttl: float = CACHE_TTL) -> None:
+        """
+        Insert into the memory cache with a per-key lifetime
+        
+        Args:
+            key: Cache key
+            value: Value to cache
+            ttl: Lifetime in seconds
+        """
+        if ttl != CACHE_TTL:
+            self._memory_ttls[key] = ttl
+        self.memory_cache[key] = value
+    
+    def _memory_ttu(self, key: str, value: Any, now: float) -> float:
+        # Called by TLRUCache on insertion to compute the expiry time
+        return now + self._memory_ttls.pop(key, CACHE_TTL)
+    
+    def _queue_write(self, mode: str, path: str, data: bytes) -> None:
+        """
+        Buffer a file-tier write and schedule a flush
+        
+        Args:
+            mode: 'a' to append to the file, 'w' to replace it
+            path: Target file path
+            data: Serialized content to write
+        """
+        with self._write_lock:
+            self._pending_writes.append((mode, path, data))
+            if self._flush_timer is None:
+                self._flush_timer = threading.Timer(CACHE_FLUSH_INTERVAL, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+    
+    def flush(self) -> None:
+        """
+        Write all buffered file-tier entries, one open per target file
+        """
+        with self._write_lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            pending = list(self._pending_writes)
+            self._pending_writes.clear()
+            
+            # Group by target so each file is opened once per flush
+            batches: Dict[str, Tuple[str, List[bytes]]] = {}
+            for mode, path, data in pending:
+                if mode == 'w' or path not in batches:
+                    batches[path] = (mode, [data])
+                else:
+                    batches[path][1].append(data)
+            
+            for path, (mode, chunks) in batches.items():
+                try:
+                    with open(path, mode + 'b') as f:
+                        f.write(b"".join(chunks))
+                except Exception as e:
+                    print(f"Error flushing cache file {path}: {e}")
+    
+    def _rebuild_bloom_filters(self) -> None:
+        """
+        Seed the Bloom filters from the persistent cache tiers on startup
+        """
+        try:
+            for key in self.disk_cache.iterkeys():
+                if not isinstance(key, str):
+                    continue
+                if key.startswith("video_processed:"):
+                    self.video_bloom.add(key[len("video_processed:"):])
+                elif key.startswith("query:"):
+                    self.query_bloom.add(key)
+        except Exception as e:
+            print(f"Error reading disk cache keys for Bloom filter: {e}")
+            
+        self._restore_video_markers()
+    
+    def _restore_video_markers(self) -> None:
+        """
+        Restore valid backup marker files missing from the disk cache
+        """
+        now = time.time()
+        for filename in os.listdir(self.video_cache_dir):
+            if not filename.endswith(".json"):
+                continue
+            video_id = filename[:-len(".json")]
+            memory_key = f"video_processed:{video_id}"
+            if memory_key in self.disk_cache:
+                continue
+                
+            try:
+                with open(os.path.join(self.video_cache_dir, filename), 'rb') as f:
+                    data = orjson.loads(f.read())
+                remaining = CACHE_TTL - (now - data.get('timestamp', 0))
+                if remaining > 0:
+                    self.disk_cache.set(memory_key, True, expire=remaining)
+                    self.video_bloom.add(video_id)
+            except:
+                continue
+    
+    def _query_log_path(self, video_id: str) -> str:
+        """
+        Path of the append-only JSONL log backing a video's query index
+        
+        Args:
+            video_id: Unique video identifier
+            
+        Returns:
+            Log file path
+        """
+        return os.path.join(self.query_cache_dir, f"{video_id}.jsonl")
+    
+    def _get_query_index(self, video_id: str) -> Dict[str, QueryEntry]:
+        """
+        Get the in-memory query index for a video, loading it on first use
+        
+        Args:
+            video_id: Unique video identifier
+            
+        Returns:
+            Dict mapping query hash to QueryEntry
+        """
+        with self._lock:
+            index = self.query_index.get(video_id)
+            if index is not None:
+                return index
+            
+            index = {}
+            lines = 0
+            log_path = self._query_log_path(video_id)
+            if os.path.exists(log_path):
+                with open(log_path, 'rb') as f:
+                    for line in f:
+                        lines += 1
+                        try:
+                            data = orjson.loads(line)
+                            query = data['query']
+                            index[self._hash_query(query)] = (query, data.get('response'), data['timestamp'])
+                        except (ValueError, KeyError, TypeError):
+                            continue
+        
+            # Fold in legacy per-query JSON files ({video_id}_{md5}.json)
+            legacy_files = self._legacy_query_files(video_id)
+            if legacy_files:
+                # Overlap the open/read/parse latency of many small files
+                with ThreadPoolExecutor(max_workers=LEGACY_LOAD_WORKERS) as executor:
+                    legacy_entries = list(executor.map(_load_legacy_query_file, legacy_files))
+                for entry in legacy_entries:
+                    if not entry:
+                        continue
+                    query_hash = self._hash_query(entry[0])
+                    if query_hash not in index or index[query_hash][2] < entry[2]:
+                        index[query_hash] = entry
+        
+            # Drop expired entries
+            now = time.time()
+            live_entries = {h: e for h, e in index.items() if (now - e[2]) < CACHE_TTL}
+        
+            index = self.query_index[video_id] = {}
+            self.query_postings[video_id] = {}
+            for query_hash, (query, response, timestamp) in live_entries.items():
+                self._add_to_query_index(video_id, query_hash, query, response, timestamp)
+            self.query_log_lines[video_id] = lines
+        
+            if legacy_files or lines > max(QUERY_LOG_COMPACT_MIN_LINES, 2 * len(index)):
+                self._compact_query_log(video_id)
+                for qf in legacy_files:
+                    try:
+                        os.remove(qf)
+                    except OSError:
+                        pass
+        
+            return index
+    
+    def _add_to_query_index(
+        self,
+        video_id: str,
+        query_hash: str,
+        query: str,
+        response: Optional[str],
+        timestamp: float
+    ) -> None:
+        """
+        Insert an entry into a loaded query index and its word postings
+        
+        Args:
+            video_id: Unique video identifier
+            query_hash: Hash of the normalized query
+            query: Normalized query text
+            response: Response carried by legacy entries, None otherwise
+            timestamp: Time the entry was cached
+        """
+        # Entries share one interned video_id string; the token set is built once
+        # here so similarity checks are pure set arithmetic
+        video_id = sys.intern(video_id)
+        entry = QueryEntry(
+            video_id=video_id,
+            query=query,
+            response=response,
+            timestamp=timestamp,
+            words=frozenset(query.lower().split())
+        )
+        self.query_index[video_id][query_hash] = entry
+        postings = self.query_postings.setdefault(video_id, {})
+        for word in entry.words:
+            postings.setdefault(word, set()).add(query_hash)
+    
+    def _legacy_query_files(self, video_id: str) -> List[str]:
+        """
+        List per-query JSON files written by older versions for a video
+        
+        Args:
+            video_id: Unique video identifier
+            
+        Returns:
+            List of file paths
+        """
+        prefix = f"{video_id}_"
+        # {video_id}_{32 hex chars}.json
+        expected_len = len(prefix) + 32 + len(".json")
+        try:
+            return [os.path.join(self.query_cache_dir, f) for f in os.listdir(self.query_cache_dir)
+                    if f.startswith(prefix) and f.endswith(".json") and len(f) == expected_len]
+        except OSError:
+            return []
+    
+    def _compact_query_log(self, video_id: str) -> None:
+        """
+        Rewrite a video's query log with only its live index entries
+        
+        Args:
+            video_id: Unique video identifier
+        """
+        index = self.query_index.get(video_id, {})
+        log_path = self._query_log_path(video_id)
+        tmp_path = log_path + ".tmp"
+        
+        with self._write_lock:
+            # The rewrite already contains every buffered entry for this log
+            remaining = [w for w in self._pending_writes if w[1] != log_path]
+            self._pending_writes.clear()
+            self._pending_writes.extend(remaining)
+            
+            with open(tmp_path, 'wb') as f:
+                for entry in index.values():
+                    record = {'query': entry.query, 'timestamp': entry.timestamp}
+                    if entry.response:
+                        record['response'] = entry.response
+                    f.write(orjson.dumps(record, option=orjson.OPT_APPEND_NEWLINE))
+            os.replace(tmp_path, log_path)
+        self.query_log_lines[video_id] = len(index)
     
     def _hash_query(self, query: str) -> str:
         """
@@ -259,4 +657,23 @@ class CacheManager:
         Returns:
             Hash string
         """
-        return hashlib.md5(query.encode()).hexdigest()
+        return _hash_text(query)
+
+
+def _load_legacy_query_file(path: str) -> Optional[Tuple[str, str, float]]:
+    # Returns (query, response, timestamp) or None for unusable files
+    try:
+        with open(path, 'rb') as f:
+            data = orjson.loads(f.read())
+        query = data.get('query', '')
+        if query and data.get('response'):
+            return (query, data['response'], data.get('timestamp', 0))
+    except Exception:
+        pass
+    return None
+
+
+@lru_cache(maxsize=4096)
+def _hash_text(text: str) -> str:
+    # Repeated queries skip hashing entirely; xxh3 is much cheaper than md5
+    return xxhash.xxh3_128(text.encode()).hexdigest()
@@ -0,0 +1,45 @@
+"""
+Instrumented memory cache for sizing decisions
+"""
+from typing import Any, Dict
+
+from cachetools import TLRUCache
+
+from cache.bloom import BloomFilter
+
+
+class CountingCache(TLRUCache):
+    """TLRUCache that counts hits and misses and remembers recently evicted keys
+    
+    A miss on a key that was recently evicted by size pressure is counted as
+    "just missed": a high share of those means a larger maxsize would help,
+    while plain misses on never-seen keys would not.
+    """
+    
+    def __init__(self, maxsize: int, ttu, evicted_capacity: int, **kwargs):
+        super().__init__(maxsize=maxsize, ttu=ttu, **kwargs)
+        self.stats: Dict[str, int] = {"hits": 0, "misses": 0, "just_missed": 0, "evictions": 0}
+        # Two rotating filters so memory of evictions stays bounded
+        self._evicted_capacity = evicted_capacity
+        self._evicted_current = BloomFilter(evicted_capacity)
+        self._evicted_previous = BloomFilter(evicted_capacity)
+        
+    def get(self, key, default=None) -> Any:
+        if key in self:
+            self.stats["hits"] += 1
+            return self[key]
+            
+        self.stats["misses"] += 1
+        if key in self._evicted_current or key in self._evicted_previous:
+            self.stats["just_missed"] += 1
+        return default
+        
+    def popitem(self):
+        # Only called when the cache is full, i.e. on size-driven eviction
+        key, value = super().popitem()
+        self.stats["evictions"] += 1
+        if self._evicted_current.count >= self._evicted_capacity:
+            self._evicted_previous = self._evicted_current
+            self._evicted_current = BloomFilter(self._evicted_capacity)
+        self._evicted_current.add(key)
+        return key, value
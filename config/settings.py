@@ -15,6 +15,7 @@ if os.getenv("LANGSMITH_TRACING") == "true":
 BASE_DIR = Path(__file__).resolve().parent.parent
 STORAGE_DIR = os.path.join(BASE_DIR, "storage")
 VECTOR_DIR = os.path.join(STORAGE_DIR, "vectors")
+BM25_DIR = os.path.join(VECTOR_DIR, "bm25")
 CACHE_DIR = os.path.join(STORAGE_DIR, "cache")
 MEDIA_DIR = os.path.join(STORAGE_DIR, "media")
 
@@ -31,21 +32,38 @@ TRANSCRIPTION_MODEL = os.getenv("TRANSCRIPTION_MODEL", "whisper-1")
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY", "pcsk_7SCQAy_QtPgWpjvei5NsmcoZ5JvzQne8kUUWimQfgaMVhZyvpKPCtmEHFug6i7bVoqHqgN")
 PINECONE_ENVIRONMENT = os.getenv("PINECONE_ENVIRONMENT", "us-west-1")
 PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME", "youtube-index")
+PINECONE_UPSERT_BATCH_SIZE = 100  # Vectors per upsert request (Pinecone caps request size at 2MB)
 DEFAULT_CHUNK_SIZE = 4000
 DEFAULT_CHUNK_OVERLAP = 400
+SUMMARY_DIRECT_MAX_CHARS = 12000  # Longer content is summarized chunk-by-chunk, then reduced
 
 # Performance Settings
 MAX_CONCURRENT = int(os.getenv("MAX_CONCURRENT", "3"))
+THREAD_POOL_WORKERS = int(os.getenv("THREAD_POOL_WORKERS", "16"))  # Shared pool for blocking I/O
+DOWNLOAD_POOL_WORKERS = int(os.getenv("DOWNLOAD_POOL_WORKERS", "4"))  # Long-running media downloads
 CACHE_TTL = 86400  # 24 hours (in seconds)
+MEMORY_CACHE_SIZE = int(os.getenv("MEMORY_CACHE_SIZE", "1000"))
+MAX_CACHE_TTL = 2 * CACHE_TTL  # Upper bound for TTLs extended by repeated hits
+CACHE_TTL_HIT_FACTOR = 0.25  # TTL grows by this fraction of CACHE_TTL per hit
+SIMILAR_QUERY_TTL = 3600  # Responses reused via similar-query matching (seconds)
+NEGATIVE_CACHE_TTL = 30  # Seconds a cache miss is remembered
+LLM_CACHE_SIZE = 1024  # Identical-prompt LLM responses kept in memory
+LLM_CACHE_TTL = 3600  # 1 hour (in seconds)
+BLOOM_CAPACITY = int(os.getenv("BLOOM_CAPACITY", "100000"))  # Expected cache keys per filter
+BLOOM_ERROR_RATE = 0.01
+CACHE_FLUSH_INTERVAL = 5.0  # Seconds between batched cache file writes
+DISK_CACHE_COMPRESS_MIN_BYTES = 512  # Smaller values are stored uncompressed
+DISK_CACHE_COMPRESS_LEVEL = 3
 
 # YouTube download settings
 AUDIO_FORMAT = "mp3"
 DEFAULT_AUDIO_QUALITY = "64k"
 LONG_AUDIO_QUALITY = "18k"  # Lower quality for long videos
 LONG_VIDEO_THRESHOLD = 60 * 60  # 60 minutes in seconds
+TRANSCRIPTION_SHARD_SECONDS = 5 * 60  # Length of audio shards transcribed in parallel
 
 # Ensure storage directories exist
-for dir_path in [VECTOR_DIR, CACHE_DIR, MEDIA_DIR]:
+for dir_path in [VECTOR_DIR, BM25_DIR, CACHE_DIR, MEDIA_DIR]:
     os.makedirs(dir_path, exist_ok=True)
 
 DEMO_MODE = os.getenv("DEMO_MODE", "false").lower() == "true"
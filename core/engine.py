@@ -6,6 +6,7 @@ from transcription.service import TranscriptionService
 from retrieval.vector_store import VectorStore
 from llm.provider import LLMProvider
 from cache.manager import CacheManager
+from config.settings import MAX_CONCURRENT, SUMMARY_DIRECT_MAX_CHARS
 
 
 
@@ -21,10 +22,22 @@ class ProcessingEngine:
         video_id = self.youtube_service.extract_video_id(video_url)
 
         if self.cache_manager.has_processed_video(video_id):
-            return video_id
-
-        audio_path = await self.youtube_service.download_audio(video_url, options)
-        transcript_data = await self.transcription.transcribe(audio_path, video_id, options)
+            if self.vector_store.has_chunk_store(video_id):
+                return video_id
+            # Indexed by an older version: replace its vectors and build the chunk store
+            await self.vector_store.clear_video(video_id)
+
+        # A cached transcript makes the download unnecessary
+        transcript_data = await self.transcription.get_cached(video_id)
+        if transcript_data is None:
+            try:
+                audio_path = await self.youtube_service.download_audio(video_url, options)
+            finally:
+                await self.youtube_service.close()
+            try:
+                transcript_data = await self.transcription.transcribe(audio_path, video_id, options)
+            finally:
+                await self.transcription.close()
         await self.vector_store.index_transcript(transcript_data, video_id)
         self.cache_manager.mark_video_processed(video_id)
 
@@ -37,6 +50,8 @@ class ProcessingEngine:
         stream: bool = True,
         options: Dict[str, Any] = {}
     ) -> Union[str, AsyncGenerator[Dict[str, Any], None], Dict[str, Any]]:
+        # File-backed cache state is loaded in a worker thread, not on the event loop
+        await self.cache_manager.preload_query_index(video_id)
         cached_response = self.cache_manager.get_cached_response(video_id, query)
         if cached_response:
             if stream:
@@ -69,23 +84,29 @@ class ProcessingEngine:
         if stream:
             async def process_stream():
                 full_response = ""
-                async for chunk in self.llm_provider.stream_response(query, context_data, video_id=video_id):
-                    if not chunk["is_complete"]:
-                        full_response += chunk["token"]
-                        yield chunk
-                    else:
-                        processed_response = chunk.get("processed_response", full_response)
-                        self.cache_manager.cache_response(video_id, query, processed_response)
-                        yield {
-                            "token": "",
-                            "is_complete": True,
-                            "processed_response": processed_response
-                        }
+                try:
+                    async for chunk in self.llm_provider.stream_response(query, context_data, video_id=video_id):
+                        if not chunk["is_complete"]:
+                            full_response += chunk["token"]
+                            yield chunk
+                        else:
+                            processed_response = chunk.get("processed_response", full_response)
+                            self.cache_manager.cache_response(video_id, query, processed_response)
+                            yield {
+                                "token": "",
+                                "is_complete": True,
+                                "processed_response": processed_response
+                            }
+                finally:
+                    await self.llm_provider.close()
 
             return process_stream()
 
         else:
-            result = await self.llm_provider.generate(query, context_data, video_id=video_id)
+            try:
+                result = await self.llm_provider.generate(query, context_data, video_id=video_id)
+            finally:
+                await self.llm_provider.close()
             processed_response = result["response"]
             self.cache_manager.cache_response(video_id, query, processed_response)
 
@@ -95,6 +116,7 @@ class ProcessingEngine:
                             }
 
     async def summarize_video(self, video_id: str, length: str = "medium") -> str:
+        await self.cache_manager.preload_query_index(video_id)
         cached_summary = self.cache_manager.get_cached_response(video_id, f"summarize {length}")
         if cached_summary:
             return cached_summary
@@ -106,7 +128,23 @@ class ProcessingEngine:
             print("[WARNING] Transcript is empty, skipping summarization.")
             return ""
 
-        summary = await self.llm_provider.summarize(full_content, length)
+        try:
+            if len(full_content) <= SUMMARY_DIRECT_MAX_CHARS:
+                summary = await self.llm_provider.summarize(full_content, length, video_id=video_id)
+            else:
+                # Map-reduce: summarize chunks concurrently, then summarize the partials.
+                # Partials for identical chunk text are served from the provider's response cache.
+                semaphore = asyncio.Semaphore(MAX_CONCURRENT)
+
+                async def summarize_chunk(chunk_content: str) -> str:
+                    async with semaphore:
+                        return await self.llm_provider.summarize(chunk_content, "short", video_id=video_id)
+
+                partials = await asyncio.gather(*[summarize_chunk(chunk["content"]) for chunk in all_chunks])
+                summary = await self.llm_provider.summarize("\n".join(partials), length, video_id=video_id)
+        finally:
+            await self.llm_provider.close()
+
         self.cache_manager.cache_response(video_id, f"summarize {length}", summary)
 
         return summary
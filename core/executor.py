@@ -0,0 +1,26 @@
+"""
+Shared bounded thread pool for blocking calls made from async code
+"""
+import asyncio
+import functools
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
+from config.settings import THREAD_POOL_WORKERS
+
+T = TypeVar("T")
+
+# One process-wide pool: main.py calls asyncio.run per action and each run
+# shuts down its loop's default executor, so the pool is not installed as one
+_executor = ThreadPoolExecutor(max_workers=THREAD_POOL_WORKERS, thread_name_prefix="ytai")
+
+
+async def run_in_thread(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run a blocking function in the shared pool without blocking the event loop"""
+    return await run_in_executor(_executor, func, *args, **kwargs)
+
+
+async def run_in_executor(executor: Executor, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run a blocking function in a specific executor without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
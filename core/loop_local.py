@@ -0,0 +1,43 @@
+"""
+Per-event-loop storage for loop-bound async clients
+"""
+import asyncio
+import threading
+from typing import Callable, Dict, Generic, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class LoopLocal(Generic[T]):
+    """
+    One value per running event loop
+
+    main.py runs every action in a fresh asyncio.run loop, on as many Streamlit
+    script threads as there are sessions, and async HTTP clients may only be used
+    from the loop that opened their connections. A value is therefore reused only
+    within one action's loop, never across actions; owners should pop and close
+    it before their loop finishes
+    """
+
+    def __init__(self, factory: Callable[[], T]):
+        self._factory = factory
+        self._values: Dict[asyncio.AbstractEventLoop, T] = {}
+        self._lock = threading.Lock()
+
+    def get(self) -> T:
+        """Return the running loop's value, creating it on first use in that loop"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            value = self._values.get(loop)
+            if value is None:
+                # Values of finished loops can never be used again
+                for old_loop in [l for l in self._values if l.is_closed()]:
+                    del self._values[old_loop]
+                value = self._values[loop] = self._factory()
+            return value
+
+    def pop(self) -> Optional[T]:
+        """Remove and return the running loop's value so the caller can close it"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            return self._values.pop(loop, None)
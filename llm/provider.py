@@ -1,8 +1,17 @@
 
-from typing import Dict, Any, AsyncGenerator, List
+import threading
+from typing import Dict, Any, AsyncGenerator, List, Optional, Tuple
+import xxhash
+from cachetools import TTLCache
+from langdetect import detect
+from langdetect.lang_detect_exception import LangDetectException
 from langchain.chat_models import ChatOpenAI
-from langchain.schema import HumanMessage, SystemMessage, AIMessage
-from config.settings import OPENAI_API_KEY, DEFAULT_MODEL
+from langchain.schema import HumanMessage, SystemMessage, AIMessage, BaseMessage
+from core.loop_local import LoopLocal
+from config.settings import OPENAI_API_KEY, DEFAULT_MODEL, LLM_CACHE_SIZE, LLM_CACHE_TTL
+
+# Characters of content sampled for language detection
+LANG_DETECT_SAMPLE_CHARS = 2000
 
 # Updated language-specific system prompts
 LANGUAGE_PROMPTS = {
@@ -32,17 +41,106 @@ LANGUAGE_PROMPTS = {
     ),
 }
 
+SUMMARY_INSTRUCTIONS = {
+    "short": {
+        "en": "Summarize the video briefly in 2-3 sentences.",
+        "ar": "لخص محتوى الفيديو بإيجاز في جملتين أو ثلاث.",
+        "es": "Resume el contenido del video en 2 o 3 frases.",
+        "it": "Riassumi brevemente il contenuto del video in 2 o 3 frasi.",
+        "sv": "Sammanfatta videons innehåll kortfattat i 2–3 meningar."
+    },
+    "medium": {
+        "en": "Summarize the main points of the video.",
+        "ar": "لخص النقاط الرئيسية في الفيديو.",
+        "es": "Resume los puntos principales del video.",
+        "it": "Riassumi i punti principali del video.",
+        "sv": "Sammanfatta huvudpunkterna i videon."
+    },
+    "detailed": {
+        "en": "Write a detailed summary of the video content.",
+        "ar": "اكتب ملخصًا مفصلًا لمحتوى الفيديو.",
+        "es": "Escribe un resumen detallado del contenido del video.",
+        "it": "Scrivi un riassunto dettagliato del contenuto del video.",
+        "sv": "Skriv en detaljerad sammanfattning av videons innehåll."
+    }
+}
+
+# Prebuilt system messages, reused across requests instead of re-validating per call
+SYSTEM_MESSAGES = {lang: SystemMessage(content=prompt) for lang, prompt in LANGUAGE_PROMPTS.items()}
+SUMMARY_MESSAGES = {
+    length: {lang: SystemMessage(content=instruction) for lang, instruction in by_lang.items()}
+    for length, by_lang in SUMMARY_INSTRUCTIONS.items()
+}
+
 class LLMProvider:
     def __init__(self):
         self.api_key = OPENAI_API_KEY
+        # Responses keyed on a hash of the exact model inputs
+        self._resp_cache = TTLCache(maxsize=LLM_CACHE_SIZE, ttl=LLM_CACHE_TTL)
+        # The provider is shared by every Streamlit session thread and TTLCache is not thread-safe
+        self._cache_lock = threading.Lock()
+        # Detected summary language per video_id
+        self._lang_cache: Dict[str, str] = {}
+        # Chat clients reused per (model, temperature, streaming) within one event loop, i.e. one
+        # action; each client's async pool is bound to its loop, so close() releases them
+        self._model_cache: LoopLocal[Dict[Tuple[str, float, bool], ChatOpenAI]] = LoopLocal(dict)
+
+    def _cache_key(self, model: str, temperature: float, messages: List[BaseMessage]) -> int:
+        h = xxhash.xxh3_128(f"{model}\x00{temperature}".encode())
+        for message in messages:
+            h.update(b"\x00" + message.content.encode())
+        return h.intdigest()
+
+    def _detect_language(self, content: str, video_id: str = "") -> str:
+        if video_id:
+            with self._cache_lock:
+                lang = self._lang_cache.get(video_id)
+            if lang:
+                return lang
+
+        # A bounded prefix is enough to classify the language
+        try:
+            lang = detect(content[:LANG_DETECT_SAMPLE_CHARS])
+        except LangDetectException:
+            lang = "en"
+        if lang not in LANGUAGE_PROMPTS:
+            lang = "en"
+
+        if video_id:
+            with self._cache_lock:
+                self._lang_cache[video_id] = lang
+        return lang
+
+    async def close(self) -> None:
+        """Close the running loop's chat clients before that loop finishes"""
+        models = self._model_cache.pop() or {}
+        for llm in models.values():
+            # ChatOpenAI keeps its AsyncOpenAI client behind the chat.completions resource
+            client = getattr(getattr(llm, "async_client", None), "_client", None)
+            if client is not None:
+                await client.close()
+
+    def _get_cached(self, key: int) -> Optional[str]:
+        with self._cache_lock:
+            return self._resp_cache.get(key)
+
+    def _set_cached(self, key: int, value: str) -> str:
+        with self._cache_lock:
+            self._resp_cache[key] = value
+        return value
 
     def _get_model(self, temperature: float, model: str, streaming: bool = False):
-        return ChatOpenAI(
-            model_name=model,
-            temperature=temperature,
-            openai_api_key=self.api_key,
-            streaming=streaming
-        )
+        key = (model, temperature, streaming)
+        models = self._model_cache.get()
+        llm = models.get(key)
+        if llm is None:
+            llm = models[key] = ChatOpenAI(
+                model_name=model,
+                temperature=temperature,
+                openai_api_key=self.api_key,
+                streaming=streaming
+            )
+        return llm
 
     async def generate(
         self,
@@ -55,17 +153,21 @@ class LLMProvider:
     ) -> Dict[str, Any]:
         context_text = "\n\n".join([item["content"] for item in context_data])
         lang = context_data[0].get("language", "en") if context_data else "en"
-        system_message = LANGUAGE_PROMPTS.get(lang, LANGUAGE_PROMPTS["en"])
+        system_message = SYSTEM_MESSAGES.get(lang, SYSTEM_MESSAGES["en"])
 
         messages = [
-            SystemMessage(content=system_message),
+            system_message,
             HumanMessage(content=f"{prompt}\n\nTranscript:\n{context_text}")
         ]
 
-        llm = self._get_model(temperature=temperature, model=model, streaming=False)
-        response = await llm.apredict_messages(messages)
+        key = self._cache_key(model, temperature, messages)
+        content = self._get_cached(key)
+        if content is None:
+            llm = self._get_model(temperature=temperature, model=model, streaming=False)
+            response = await llm.apredict_messages(messages)
+            content = self._set_cached(key, response.content)
 
-        return {"response": response.content}
+        return {"response": content}
 
     async def stream_response(
         self,
@@ -78,13 +180,27 @@ class LLMProvider:
     ) -> AsyncGenerator[Dict[str, Any], None]:
         context_text = "\n\n".join([item["content"] for item in context_data])
         lang = context_data[0].get("language", "en") if context_data else "en"
-        system_message = LANGUAGE_PROMPTS.get(lang, LANGUAGE_PROMPTS["en"])
+        system_message = SYSTEM_MESSAGES.get(lang, SYSTEM_MESSAGES["en"])
 
         messages = [
-            SystemMessage(content=system_message),
+            system_message,
             HumanMessage(content=f"{prompt}\n\nTranscript:\n{context_text}")
         ]
 
+        key = self._cache_key(model, temperature, messages)
+        cached = self._get_cached(key)
+        if cached is not None:
+            yield {
+                "token": cached,
+                "is_complete": False
+            }
+            yield {
+                "token": "",
+                "is_complete": True,
+                "processed_response": cached
+            }
+            return
+
         llm = self._get_model(temperature=temperature, model=model, streaming=True)
         full_response = ""
 
@@ -96,6 +212,7 @@ class LLMProvider:
                     "is_complete": False
                 }
 
+        self._set_cached(key, full_response)
         yield {
             "token": "",
             "is_complete": True,
@@ -106,7 +223,8 @@ class LLMProvider:
         self,
         content: str,
         length: str = "medium",
-        model: str = DEFAULT_MODEL
+        model: str = DEFAULT_MODEL,
+        video_id: str = ""
     ) -> str:
         max_tokens_map = {
             "short": 100,
@@ -114,47 +232,23 @@ class LLMProvider:
             "detailed": 500
         }
 
-        instructions_map = {
-            "short": {
-                "en": "Summarize the video briefly in 2-3 sentences.",
-                "ar": "لخص محتوى الفيديو بإيجاز في جملتين أو ثلاث.",
-                "es": "Resume el contenido del video en 2 o 3 frases.",
-                "it": "Riassumi brevemente il contenuto del video in 2 o 3 frasi.",
-                "sv": "Sammanfatta videons innehåll kortfattat i 2–3 meningar."
-            },
-            "medium": {
-                "en": "Summarize the main points of the video.",
-                "ar": "لخص النقاط الرئيسية في الفيديو.",
-                "es": "Resume los puntos principales del video.",
-                "it": "Riassumi i punti principali del video.",
-                "sv": "Sammanfatta huvudpunkterna i videon."
-            },
-            "detailed": {
-                "en": "Write a detailed summary of the video content.",
-                "ar": "اكتب ملخصًا مفصلًا لمحتوى الفيديو.",
-                "es": "Escribe un resumen detallado del contenido del video.",
-                "it": "Scrivi un riassunto dettagliato del contenuto del video.",
-                "sv": "Skriv en detaljerad sammanfattning av videons innehåll."
-            }
-        }
-
-        lang = "en"
-        if "ال" in content: lang = "ar"
-        elif " el " in content or " la " in content: lang = "es"
-        elif " il " in content or " lo " in content: lang = "it"
-        elif " och " in content or " att " in content: lang = "sv"
+        lang = self._detect_language(content, video_id)
 
-        instruction = instructions_map.get(length, instructions_map["medium"]).get(lang, instructions_map["medium"]["en"])
+        instruction = SUMMARY_MESSAGES.get(length, SUMMARY_MESSAGES["medium"]).get(lang, SUMMARY_MESSAGES["medium"]["en"])
         max_tokens = max_tokens_map.get(length, 250)
 
         messages = [
-            SystemMessage(content=instruction),
+            instruction,
             HumanMessage(content=f"Transcript:\n{content}")
         ]
 
-        llm = self._get_model(temperature=0.3, model=model, streaming=False)
-        response = await llm.apredict_messages(messages)
-        return response.content.strip()
+        key = self._cache_key(model, 0.3, messages)
+        result = self._get_cached(key)
+        if result is None:
+            llm = self._get_model(temperature=0.3, model=model, streaming=False)
+            response = await llm.apredict_messages(messages)
+            result = self._set_cached(key, response.content.strip())
+        return result
 
     async def answer(
         self,
@@ -163,14 +257,18 @@ class LLMProvider:
         model: str = DEFAULT_MODEL
     ) -> str:
         lang = "en"
-        system_message = LANGUAGE_PROMPTS.get(lang, LANGUAGE_PROMPTS["en"])
+        system_message = SYSTEM_MESSAGES.get(lang, SYSTEM_MESSAGES["en"])
 
         messages = [
-            SystemMessage(content=system_message),
+            system_message,
             HumanMessage(content=f"Question: {question}\n\nTranscript:\n{context}")
         ]
 
-        llm = self._get_model(temperature=0.2, model=model, streaming=False)
-        response = await llm.apredict_messages(messages)
-        return response.content.strip()
+        key = self._cache_key(model, 0.2, messages)
+        result = self._get_cached(key)
+        if result is None:
+            llm = self._get_model(temperature=0.2, model=model, streaming=False)
+            response = await llm.apredict_messages(messages)
+            result = self._set_cached(key, response.content.strip())
+        return result
     
@@ -5,7 +5,21 @@ import datetime
 import streamlit as st
 from core.engine import ProcessingEngine
 
-engine = ProcessingEngine()
+# Every asyncio.run below picks up the libuv-based loop when uvloop is available
+# (it is not on Windows, where the default asyncio loop is used)
+try:
+    import uvloop
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+except ImportError:
+    pass
+
+# Streamlit reruns this script on every interaction; build the engine (API clients,
+# Pinecone index handle, caches) once per process and reuse it
+@st.cache_resource
+def get_engine() -> ProcessingEngine:
+    return ProcessingEngine()
+
+engine = get_engine()
 
 st.set_page_config(
     page_title="YouTube AI Assistant C-Version",
@@ -66,6 +80,12 @@ with st.sidebar:
     - Parallel processing
     """)
 
+    with st.expander("Cache Statistics"):
+        stats = engine.cache_manager.get_stats()
+        st.metric("Memory hit ratio", f"{stats['hit_ratio']:.1%}")
+        st.write(f"Hits: {stats['hits']} · Misses: {stats['misses']} · Just missed: {stats['just_missed']}")
+        st.write(f"Evictions: {stats['evictions']} · Size: {stats['size']}/{stats['maxsize']}")
+
 # Process video
 if submit_button and youtube_url:
     start_time = time.time()
@@ -162,21 +182,31 @@ if st.session_state.video_id:
 
         if st.session_state.chat_history and st.session_state.chat_history[-1]["role"] == "user":
             last_user_query = st.session_state.chat_history[-1]["content"]
+            response_placeholder = st.empty()
 
             with st.status("Generating response...", expanded=False) as status:
                 try:
                     start_time = time.time()
 
                     options = st.session_state.get("options", {})  # ✅ load saved options
-                    result = asyncio.run(engine.query_video(
-                        st.session_state.video_id,
-                        last_user_query,
-                        stream=False,
-                        options=options
-                    ))
 
-                    response = result["response"]
-                   
+                    # Render tokens as they arrive instead of waiting for the full completion
+                    async def stream_response():
+                        text = ""
+                        chunks = await engine.query_video(
+                            st.session_state.video_id,
+                            last_user_query,
+                            stream=True,
+                            options=options
+                        )
+                        async for chunk in chunks:
+                            if chunk["is_complete"]:
+                                return chunk.get("processed_response") or text
+                            text += chunk["token"]
+                            response_placeholder.markdown(f"**Assistant:** {text}")
+                        return text
+
+                    response = asyncio.run(stream_response())
 
                     st.session_state.chat_history.append({
                         "role": "assistant",
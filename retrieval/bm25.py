@@ -0,0 +1,172 @@
+"""
+BM25 keyword index with compiled scoring and top-k selection
+"""
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+import orjson
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True)
+    def _bm25_score(query_weights, indptr, term_ids, tfs, doc_lens, avgdl, k1, b):
+        # query_weights[t] is idf[t] times the number of times t occurs in the query,
+        # so each document is a single linear scan over its postings. Serial on purpose:
+        # per-video corpora are tens of chunks, and numba's parallel threading layers
+        # are not all safe to enter from several session threads at once
+        n_docs = doc_lens.shape[0]
+        scores = np.zeros(n_docs, dtype=np.float64)
+        for d in range(n_docs):
+            norm = k1 * (1.0 - b + b * doc_lens[d] / avgdl)
+            score = 0.0
+            for j in range(indptr[d], indptr[d + 1]):
+                weight = query_weights[term_ids[j]]
+                if weight != 0.0:
+                    tf = tfs[j]
+                    score += weight * tf * (k1 + 1.0) / (tf + norm)
+            scores[d] = score
+        return scores
+
+    @njit(cache=True)
+    def _topk(scores, k):
+        # Insertion into a sorted buffer of size k; ties keep the lower index first
+        k = min(k, scores.shape[0])
+        top_idx = np.empty(k, dtype=np.int64)
+        top_scores = np.empty(k, dtype=np.float64)
+        filled = 0
+        for i in range(scores.shape[0]):
+            score = scores[i]
+            if filled < k:
+                pos = filled
+                filled += 1
+            elif score > top_scores[k - 1]:
+                pos = k - 1
+            else:
+                continue
+            while pos > 0 and top_scores[pos - 1] < score:
+                top_scores[pos] = top_scores[pos - 1]
+                top_idx[pos] = top_idx[pos - 1]
+                pos -= 1
+            top_scores[pos] = score
+            top_idx[pos] = i
+        return top_idx
+
+else:
+    def _bm25_score(query_weights, indptr, term_ids, tfs, doc_lens, avgdl, k1, b):
+        n_docs = doc_lens.shape[0]
+        posting_docs = np.repeat(np.arange(n_docs), np.diff(indptr))
+        norms = k1 * (1.0 - b + b * doc_lens / avgdl)
+        tf = tfs.astype(np.float64)
+        contributions = query_weights[term_ids] * tf * (k1 + 1.0) / (tf + norms[posting_docs])
+        return np.bincount(posting_docs, weights=contributions, minlength=n_docs)
+
+    def _topk(scores, k):
+        return np.argsort(-scores, kind="stable")[:k]
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into the lowercase terms used for both indexing and queries"""
+    # str.lower already takes a C fast path for ASCII strings and str.split is the
+    # cheapest splitter; a bytes.translate lowercasing plus regex tokenizer measured
+    # several times slower here, and an ASCII-only regex would drop non-Latin scripts
+    return text.lower().split()
+
+
+# Arrays persisted one .npy file each so they can be memory-mapped on load
+_ARRAY_NAMES = ("indptr", "term_ids", "tfs", "doc_lens", "idf")
+_META_FILE = "meta.json"
+
+
+class BM25Index:
+    """Okapi BM25 over tokenized documents stored as CSR term-frequency arrays"""
+
+    def __init__(self, corpus: List[List[str]], k1: float = 1.5, b: float = 0.75, epsilon: float = 0.25):
+        self.k1 = k1
+        self.b = b
+        self.vocab: Dict[str, int] = {}
+
+        # Tokens are mapped to integer ids once here; per-document unique ids
+        # and their counts become the CSR row for that document
+        vocab = self.vocab
+        doc_term_ids: List[np.ndarray] = []
+        doc_tfs: List[np.ndarray] = []
+        doc_lens = np.empty(len(corpus), dtype=np.int32)
+
+        for d, tokens in enumerate(corpus):
+            ids = np.fromiter(
+                (vocab.setdefault(token, len(vocab)) for token in tokens),
+                dtype=np.int32,
+                count=len(tokens)
+            )
+            unique_ids, counts = np.unique(ids, return_counts=True)
+            doc_term_ids.append(unique_ids)
+            doc_tfs.append(counts)
+            doc_lens[d] = len(tokens)
+
+        self.indptr = np.zeros(len(corpus) + 1, dtype=np.int64)
+        np.cumsum([len(ids) for ids in doc_term_ids], out=self.indptr[1:])
+        self.term_ids = np.concatenate(doc_term_ids) if corpus else np.empty(0, dtype=np.int32)
+        self.tfs = np.concatenate(doc_tfs).astype(np.int32) if corpus else np.empty(0, dtype=np.int32)
+        self.doc_lens = doc_lens
+        self.avgdl = float(doc_lens.mean()) if len(corpus) else 0.0
+        if not self.avgdl:
+            self.avgdl = 1.0
+
+        # Same IDF as rank_bm25's BM25Okapi: negative values are floored to
+        # epsilon * average IDF so very common terms still score slightly
+        n_docs = len(corpus)
+        doc_freqs = np.bincount(self.term_ids, minlength=len(vocab))
+        idf = np.log(n_docs - doc_freqs + 0.5) - np.log(doc_freqs + 0.5)
+        if len(idf):
+            idf[idf < 0] = epsilon * idf.mean()
+        self.idf = idf.astype(np.float32)
+
+    def save(self, directory: str) -> None:
+        os.makedirs(directory, exist_ok=True)
+        for name in _ARRAY_NAMES:
+            np.save(os.path.join(directory, f"{name}.npy"), getattr(self, name))
+        # Metadata is written last; its presence marks a complete index
+        meta = {"k1": self.k1, "b": self.b, "avgdl": self.avgdl, "vocab": self.vocab}
+        with open(os.path.join(directory, _META_FILE), "wb") as f:
+            f.write(orjson.dumps(meta))
+
+    @classmethod
+    def load(cls, directory: str, mmap_mode: Optional[str] = "r") -> "BM25Index":
+        with open(os.path.join(directory, _META_FILE), "rb") as f:
+            meta = orjson.loads(f.read())
+
+        index = cls.__new__(cls)
+        index.k1 = meta["k1"]
+        index.b = meta["b"]
+        index.avgdl = meta["avgdl"]
+        index.vocab = meta["vocab"]
+        for name in _ARRAY_NAMES:
+            setattr(index, name, np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode))
+        return index
+
+    def __len__(self) -> int:
+        return self.doc_lens.shape[0]
+
+    def get_scores(self, query_tokens: List[str]) -> np.ndarray:
+        vocab = self.vocab
+        query_term_ids = np.fromiter(
+            (vocab[token] for token in query_tokens if token in vocab),
+            dtype=np.int32
+        )
+        query_weights = self.idf * np.bincount(query_term_ids, minlength=len(self.idf))
+        return _bm25_score(
+            query_weights, self.indptr, self.term_ids, self.tfs,
+            self.doc_lens, self.avgdl, self.k1, self.b
+        )
+
+    def top_k(self, query_tokens: List[str], k: int) -> List[int]:
+        if not len(self) or k <= 0:
+            return []
+        return _topk(self.get_scores(query_tokens), k).tolist()
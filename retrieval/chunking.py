@@ -4,6 +4,11 @@ Smart document chunking strategies for improved retrieval
 import re
 from typing import List, Optional, Dict, Any
 
+_PARA_RE = re.compile(r'\n\s*\n')
+# Simple heuristic to detect topic changes: look for headings or significant paragraph breaks
+_TOPIC_RE = re.compile(r'(?:\n\s*#{1,3}\s+.+)|(?:\n\s*\n\s*\n)')
+_HEADING_RE = re.compile(r'\s*#+\s+(.+)')
+
 def adaptive_text_splitter(
     text: str, 
     chunk_size: int = 4000, 
@@ -23,16 +28,22 @@ def adaptive_text_splitter(
         List of text chunks
     """
     # Try to split on paragraph breaks first
-    paragraphs = re.split(r'\n\s*\n', text)
+    paragraphs = _PARA_RE.split(text)
     
     chunks = []
     current_chunk = ""
+    # Tail of the previous chunk, prepended for context when a chunk is emitted
+    overlap_prefix = ""
     
     for para in paragraphs:
         # If adding this paragraph exceeds chunk size, start a new chunk
         if len(current_chunk) + len(para) > chunk_size - chunk_overlap:
             if current_chunk:
-                chunks.append(current_chunk)
+                chunks.append(overlap_prefix + current_chunk)
+                if len(current_chunk) > chunk_overlap:
+                    overlap_prefix = current_chunk[-chunk_overlap:] + separator
+                else:
+                    overlap_prefix = ""
             current_chunk = para
         else:
             if current_chunk:
@@ -42,18 +53,9 @@ def adaptive_text_splitter(
     
     # Add the last chunk if there's anything left
     if current_chunk:
-        chunks.append(current_chunk)
+        chunks.append(overlap_prefix + current_chunk)
     
-    # Handle overlaps
-    final_chunks = []
-    for i, chunk in enumerate(chunks):
-        if i > 0 and len(chunks[i-1]) > chunk_overlap:
-            # Add some content from the previous chunk for context
-            prev_end = chunks[i-1][-chunk_overlap:] if len(chunks[i-1]) > chunk_overlap else chunks[i-1]
-            chunk = prev_end + separator + chunk
-        final_chunks.append(chunk)
-    
-    return final_chunks
+    return chunks
 
 def semantic_chunking(
     text: str,
@@ -71,23 +73,13 @@ def semantic_chunking(
     Returns:
         List of dictionaries with chunk content and metadata
     """
-    # Simple heuristic to detect topic changes: look for headings or significant paragraph breaks
-    topic_boundary_pattern = r'(?:\n\s*#{1,3}\s+.+)|(?:\n\s*\n\s*\n)'
-    
-    # Split by potential topic boundaries
-    topic_sections = re.split(topic_boundary_pattern, text)
-    
-    # Extract matched headings/boundaries to preserve them
-    boundaries = re.findall(topic_boundary_pattern, text)
-    
-    # Reconstruct with boundaries
+    # Split at each topic boundary, keeping the boundary at the start of its section
     sections = []
-    for i, section in enumerate(topic_sections):
-        if i > 0 and i-1 < len(boundaries):
-            # Add back the boundary before the section
-            sections.append(boundaries[i-1] + section)
-        else:
-            sections.append(section)
+    section_start = 0
+    for match in _TOPIC_RE.finditer(text):
+        sections.append(text[section_start:match.start()])
+        section_start = match.start()
+    sections.append(text[section_start:])
     
     # Process sections for size
     chunks = []
@@ -97,7 +89,7 @@ def semantic_chunking(
     for section in sections:
         # Extract potential topic name (heading)
         section_topic = None
-        heading_match = re.match(r'\s*#+\s+(.+)', section)
+        heading_match = _HEADING_RE.match(section)
         if heading_match:
             section_topic = heading_match.group(1).strip()
         
@@ -2,14 +2,16 @@
 Vector storage using Pinecone v3 and BM25 hybrid search
 """
 import os
+import shutil
 import asyncio
+import hashlib
+import threading
 from typing import List, Dict, Any
 
+import orjson
+
 from langchain.embeddings.openai import OpenAIEmbeddings
 from langchain.schema import Document
-from langchain_community.vectorstores import Pinecone as LangchainPinecone
-from rank_bm25 import BM25Okapi
-from pinecone import Pinecone, ServerlessSpec
 
 from config.settings import (
     OPENAI_API_KEY,
@@ -18,26 +20,48 @@ from config.settings import (
     DEFAULT_CHUNK_OVERLAP,
     PINECONE_API_KEY,
     PINECONE_ENVIRONMENT,
-    PINECONE_INDEX_NAME
+    PINECONE_INDEX_NAME,
+    PINECONE_UPSERT_BATCH_SIZE,
+    BM25_DIR
 )
+from core.executor import run_in_thread
+from retrieval.bm25 import BM25Index, tokenize
 from retrieval.chunking import adaptive_text_splitter
 
 class VectorStore:
+    # Pinecone client and index handle shared by every instance in the process
+    _pc = None
+    _index = None
+
     def __init__(self):
-        # Pinecone client init (v3)
-        self.pc = Pinecone(api_key=PINECONE_API_KEY)
-        if PINECONE_INDEX_NAME not in self.pc.list_indexes().names():
-            self.pc.create_index(
-                name=PINECONE_INDEX_NAME,
-                dimension=1536,
-                metric="cosine",
-                spec=ServerlessSpec(cloud="aws", region=PINECONE_ENVIRONMENT)
-            )
+        self.pc, self.index = self._get_pinecone()
         self.embeddings = OpenAIEmbeddings(
             openai_api_key=OPENAI_API_KEY,
             model=EMBEDDINGS_MODEL
         )
         self.bm25_indexes = {}
+        # Guards bm25_indexes and the on-disk index directories; the store is
+        # shared by every Streamlit session thread
+        self._bm25_lock = threading.Lock()
+
+    @classmethod
+    def _get_pinecone(cls):
+        if cls._index is None:
+            # Imported here so the client library loads only when first needed
+            from pinecone import Pinecone, ServerlessSpec
+
+            # Pinecone client init (v3)
+            pc = Pinecone(api_key=PINECONE_API_KEY)
+            if PINECONE_INDEX_NAME not in pc.list_indexes().names():
+                pc.create_index(
+                    name=PINECONE_INDEX_NAME,
+                    dimension=1536,
+                    metric="cosine",
+                    spec=ServerlessSpec(cloud="aws", region=PINECONE_ENVIRONMENT)
+                )
+            cls._pc = pc
+            cls._index = pc.Index(PINECONE_INDEX_NAME)
+        return cls._pc, cls._index
 
     async def index_transcript(self, transcript_data: Dict[str, Any], video_id: str) -> None:
         transcript_text = transcript_data.get("transcript", "")
@@ -49,29 +73,55 @@ class VectorStore:
 
         texts = []
         metadatas = []
-
-        for i, chunk in enumerate(chunks):
+        # Exact duplicate chunks (repeated intros, filler) are embedded and stored only once;
+        # chunk ids stay contiguous over the surviving chunks
+        seen = set()
+
+        for chunk in chunks:
+            digest = hashlib.blake2b(chunk.encode(), digest_size=16).digest()
+            if digest in seen:
+                continue
+            seen.add(digest)
             texts.append(chunk)
             metadatas.append({
-                "chunk_id": i,
+                "chunk_id": len(texts) - 1,
                 "video_id": video_id,
                 "source": "transcript"
             })
 
-        vectorstore = LangchainPinecone.from_existing_index(
-            index_name=PINECONE_INDEX_NAME,
-            embedding=self.embeddings,
-            namespace=video_id
-        )
-
-        await asyncio.get_event_loop().run_in_executor(
-            None,
-            lambda: vectorstore.add_texts(texts=texts, metadatas=metadatas)
-        )
-
+        # One embeddings call for the whole transcript, then direct upserts. Chunk text
+        # lives only in the local chunk store (saved with the BM25 index); Pinecone
+        # ids encode the chunk_id so searches never move text over the network
+        embeddings = await run_in_thread(self.embeddings.embed_documents, texts)
+        vectors = [
+            (f"{video_id}-{i}", embedding, metadata)
+            for i, (embedding, metadata) in enumerate(zip(embeddings, metadatas))
+        ]
+
+        # Batches are sent concurrently so the round trips overlap
+        await asyncio.gather(*(
+            run_in_thread(self.index.upsert, vectors=vectors[start:start + PINECONE_UPSERT_BATCH_SIZE], namespace=video_id)
+            for start in range(0, len(vectors), PINECONE_UPSERT_BATCH_SIZE)
+        ))
+
+        # BM25 is built from the full chunk list, never from search results
         docs = [Document(page_content=t, metadata=m) for t, m in zip(texts, metadatas)]
         await self._create_bm25_index(docs, video_id)
 
+    def has_chunk_store(self, video_id: str) -> bool:
+        # Videos indexed before chunk text moved to the local store have
+        # UUID Pinecone ids and no store; searches cannot map them back to text
+        if video_id in self.bm25_indexes:
+            return True
+        return os.path.isdir(os.path.join(BM25_DIR, video_id))
+
+    async def clear_video(self, video_id: str) -> None:
+        try:
+            await run_in_thread(self.index.delete, delete_all=True, namespace=video_id)
+        except Exception as e:
+            # Nothing to clear when the namespace does not exist
+            print(f"Error clearing Pinecone namespace {video_id}: {str(e)}")
+
     async def hybrid_search(
         self,
         video_id: str,
@@ -79,70 +129,123 @@ class VectorStore:
         k: int = 4,
         vector_weight: float = 0.7
     ) -> List[Dict[str, Any]]:
-        loop = asyncio.get_event_loop()
-
-        vectorstore = LangchainPinecone.from_existing_index(
-            index_name=PINECONE_INDEX_NAME,
-            embedding=self.embeddings,
-            namespace=video_id
+        # The legs are independent: the Pinecone round trip overlaps local BM25 scoring,
+        # and a leg whose fusion weight is zero is not run at all
+        vector_ids, bm25_ids = await asyncio.gather(
+            self._vector_search(video_id, query, k=k) if vector_weight > 0 else self._no_results(),
+            self._bm25_search(video_id, query, k=k) if vector_weight < 1 else self._no_results()
         )
 
-        vector_docs = await loop.run_in_executor(
-            None,
-            lambda: vectorstore.similarity_search(query, k=k)
+        combined_ids = self._combine_search_results(
+            vector_ids, bm25_ids, vector_weight=vector_weight
         )
 
-        if video_id not in self.bm25_indexes:
-            await self._create_bm25_index(vector_docs, video_id)
-
-        bm25_results = await self._bm25_search(video_id, query, k=k)
+        # Only the fused top-k chunks are materialized as documents
+        if not await self._ensure_bm25_index(video_id):
+            return []
+        docs = self.bm25_indexes[video_id]["docs"]
+        return self._format_search_results(
+            [docs[chunk_id] for chunk_id in combined_ids[:k] if chunk_id < len(docs)]
+        )
 
-        combined_results = self._combine_search_results(
-            vector_docs, bm25_results, vector_weight=vector_weight
+    async def _no_results(self) -> List[int]:
+        return []
+
+    async def _vector_search(self, video_id: str, query: str, k: int = 4) -> List[int]:
+        query_vector = await run_in_thread(self.embeddings.embed_query, query)
+        response = await run_in_thread(
+            self.index.query,
+            vector=query_vector,
+            top_k=k,
+            namespace=video_id,
+            include_values=False,
+            include_metadata=False
         )
 
-        return self._format_search_results(combined_results[:k])
+        prefix = f"{video_id}-"
+        chunk_ids = []
+        for match in response.matches:
+            suffix = match.id[len(prefix):]
+            if match.id.startswith(prefix) and suffix.isdigit():
+                chunk_ids.append(int(suffix))
+        return chunk_ids
 
     def _format_search_results(self, docs: List[Document]) -> List[Dict[str, Any]]:
         return [{"content": doc.page_content} for doc in docs]
 
     async def _create_bm25_index(self, docs: List[Document], video_id: str) -> None:
-        tokenized = [doc.page_content.lower().split() for doc in docs]
-        self.bm25_indexes[video_id] = {
-            "index": BM25Okapi(tokenized),
-            "docs": docs
-        }
-
-    async def _bm25_search(self, video_id: str, query: str, k: int = 4) -> List[Document]:
-        if video_id not in self.bm25_indexes:
+        tokenized = [tokenize(doc.page_content) for doc in docs]
+        index = BM25Index(tokenized)
+        with self._bm25_lock:
+            self.bm25_indexes[video_id] = {
+                "index": index,
+                "docs": docs
+            }
+        await run_in_thread(self._save_bm25_index, video_id, index, docs)
+
+    def _save_bm25_index(self, video_id: str, index: BM25Index, docs: List[Document]) -> None:
+        # Build in a temporary directory and swap it in so readers never see a partial index
+        index_dir = os.path.join(BM25_DIR, video_id)
+        tmp_dir = index_dir + ".tmp"
+        with self._bm25_lock:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            try:
+                os.makedirs(tmp_dir)
+                with open(os.path.join(tmp_dir, "docs.json"), "wb") as f:
+                    f.write(orjson.dumps([{"text": d.page_content, "metadata": d.metadata} for d in docs]))
+                index.save(tmp_dir)
+                shutil.rmtree(index_dir, ignore_errors=True)
+                os.replace(tmp_dir, index_dir)
+            except Exception as e:
+                print(f"Error saving BM25 index for {video_id}: {str(e)}")
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def _load_bm25_index(self, video_id: str) -> bool:
+        # Arrays are memory-mapped, so a cold load does not re-tokenize the transcript
+        index_dir = os.path.join(BM25_DIR, video_id)
+        with self._bm25_lock:
+            # Another session may have loaded it while this one waited
+            if video_id in self.bm25_indexes:
+                return True
+            if not os.path.isdir(index_dir):
+                return False
+            try:
+                index = BM25Index.load(index_dir, mmap_mode="r")
+                with open(os.path.join(index_dir, "docs.json"), "rb") as f:
+                    docs = [Document(page_content=d["text"], metadata=d["metadata"]) for d in orjson.loads(f.read())]
+            except Exception as e:
+                print(f"Error loading BM25 index for {video_id}: {str(e)}")
+                return False
+            self.bm25_indexes[video_id] = {
+                "index": index,
+                "docs": docs
+            }
+            return True
+
+    async def _ensure_bm25_index(self, video_id: str) -> bool:
+        if video_id in self.bm25_indexes:
+            return True
+        return await run_in_thread(self._load_bm25_index, video_id)
+
+    async def _bm25_search(self, video_id: str, query: str, k: int = 4) -> List[int]:
+        if not await self._ensure_bm25_index(video_id):
             return []
 
-        index_data = self.bm25_indexes[video_id]
-        scores = index_data["index"].get_scores(query.lower().split())
-        top_k = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)[:k]
-
-        return [index_data["docs"][i] for i in top_k]
+        # Rows are stored in chunk_id order, so row indices are chunk ids
+        return self.bm25_indexes[video_id]["index"].top_k(tokenize(query), k)
 
     def _combine_search_results(
         self,
-        vector_docs: List[Document],
-        bm25_docs: List[Document],
-        vector_weight: float = 0.7
-    ) -> List[Document]:
-        vector_scores = {
-            doc.page_content: 1.0 - (i / len(vector_docs)) for i, doc in enumerate(vector_docs)
-        }
-        bm25_scores = {
-            doc.page_content: 1.0 - (i / len(bm25_docs)) for i, doc in enumerate(bm25_docs)
-        }
-
-        all_docs = {doc.page_content: doc for doc in vector_docs + bm25_docs}
-        doc_scores = []
-
-        for content, doc in all_docs.items():
-            score = (vector_scores.get(content, 0) * vector_weight +
-                     bm25_scores.get(content, 0) * (1 - vector_weight))
-            doc_scores.append((doc, score))
-
-        doc_scores.sort(key=lambda x: x[1], reverse=True)
-        return [doc for doc, _ in doc_scores]
+        vector_ids: List[int],
+        bm25_ids: List[int],
+        vector_weight: float = 0.7,
+        rrf_k: int = 60
+    ) -> List[int]:
+        # Weighted reciprocal rank fusion over integer chunk ids
+        scores: Dict[int, float] = {}
+
+        for chunk_ids, weight in ((vector_ids, vector_weight), (bm25_ids, 1 - vector_weight)):
+            for rank, chunk_id in enumerate(chunk_ids, start=1):
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + weight / (rrf_k + rank)
+
+        return sorted(scores, key=scores.__getitem__, reverse=True)
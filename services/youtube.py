@@ -3,16 +3,22 @@ YouTube service for downloading and processing videos using pytube with proxy su
 """
 import os
 import re
+import shutil
 import hashlib
 import asyncio
-import requests
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from typing import Dict, Any, Optional
 
+import aiohttp
 from pytubefix import YouTube
-from pydub import AudioSegment
 
+from core.executor import run_in_thread, run_in_executor
+from core.loop_local import LoopLocal
 from config.settings import (
     MEDIA_DIR,
+    DOWNLOAD_POOL_WORKERS,
     AUDIO_FORMAT,
     DEFAULT_AUDIO_QUALITY,
     LONG_AUDIO_QUALITY,
@@ -26,29 +32,125 @@ if PROXY_URL:
     os.environ["HTTP_PROXY"] = PROXY_URL
     os.environ["HTTPS_PROXY"] = PROXY_URL
 
+# Without an ffmpeg binary on PATH audio is cut with pydub instead (slower: full decode + re-encode)
+FFMPEG_AVAILABLE = shutil.which("ffmpeg") is not None
+
+_YT_ID_RE = re.compile(r"(youtu\.be\/|youtube\.com\/(watch\?(.*&)?v=|embed\/|v\/|shorts\/))([^?&\"'>]+)")
+# Bounded character class: a linear scan that cannot backtrack across a large page
+_TITLE_RE = re.compile(r'<title>([^<]{1,500})</title>')
+# <title> sits in <head>, so only the start of the page is read
+TITLE_SCAN_BYTES = 32768
+
+# Seconds of audio kept for each duration option
+DURATION_LIMITS = {
+    'first_5_minutes': 5*60,
+    'first_10_minutes': 10*60,
+    'first_30_minutes': 30*60,
+    'first_60_minutes': 60*60
+}
+
+# Audio-only itags YouTube serves for almost every video: 140 is AAC/m4a, 251 is Opus/webm
+PREFERRED_AUDIO_ITAGS = (140, 251)
+
+def _is_nonempty_file(path: str) -> bool:
+    # One stat answers both "does it exist" and "is it more than an empty leftover"
+    try:
+        return os.stat(path, follow_symlinks=False).st_size > 0
+    except FileNotFoundError:
+        return False
+
+def _new_http_session() -> aiohttp.ClientSession:
+    # trust_env picks up the proxy variables set above
+    return aiohttp.ClientSession(
+        timeout=aiohttp.ClientTimeout(total=10),
+        connector=aiohttp.TCPConnector(limit=20),
+        trust_env=True
+    )
+
+@lru_cache(maxsize=1024)
+def _extract_video_id(url: str) -> str:
+    match = _YT_ID_RE.search(url)
+    if match:
+        return match.group(4)
+    return hashlib.md5(url.encode()).hexdigest()
+
 class YouTubeService:
     """Handles YouTube video downloading and metadata extraction with proxy support"""
 
-    def extract_video_id(self, url: str) -> str:
+    def __init__(self):
+        # Successful page-info lookups by URL; the title never changes between requests
+        self._info_cache: Dict[str, Dict[str, Any]] = {}
+        # Audio already resolved in this process: {"video_id:duration": path}
+        self._audio_paths: Dict[str, str] = {}
+        # One service is shared by every Streamlit session thread
+        self._cache_lock = threading.Lock()
+        # aiohttp sessions are bound to the loop that created them, and every
+        # session thread runs its own loops, so each loop gets its own session
+        self._http: LoopLocal[aiohttp.ClientSession] = LoopLocal(_new_http_session)
+        # Downloads hold a thread for minutes; a dedicated pool keeps them from
+        # starving the shared pool used for embeddings, Pinecone and file I/O
+        self._download_executor = ThreadPoolExecutor(
+            max_workers=DOWNLOAD_POOL_WORKERS,
+            thread_name_prefix="ytai-dl"
+        )
+
+    def _get_http(self) -> aiohttp.ClientSession:
+        return self._http.get()
+
+    async def close(self) -> None:
+        """
+        Close the running loop's HTTP session before that loop finishes
+        """
+        session = self._http.pop()
+        if session is not None and not session.closed:
+            await session.close()
+
+    @staticmethod
+    def extract_video_id(url: str) -> str:
         """
         Extract video ID from YouTube URL or create a hash if extraction fails
         """
-        youtube_regex = r"(youtu\.be\/|youtube\.com\/(watch\?(.*&)?v=|embed\/|v\/|shorts\/))([^?&\"'>]+)"
-        match = re.search(youtube_regex, url)
-        if match:
-            return match.group(4)
-        return hashlib.md5(url.encode()).hexdigest()
+        return _extract_video_id(url)
 
     async def download_audio(self, url: str, options: Dict[str, Any]) -> str:
         """
         Download audio from YouTube video asynchronously
         """
         video_id = self.extract_video_id(url)
+        dur_opt = options.get('duration', 'full_video')
+
+        # Repeat requests in this process skip the download-side checks; one stat confirms the file is still there
+        cache_key = f"{video_id}:{dur_opt}"
+        with self._cache_lock:
+            cached = self._audio_paths.get(cache_key)
+        if cached:
+            if os.path.exists(cached):
+                return cached
+            # Removed by cleanup since it was resolved; fetch it again
+            with self._cache_lock:
+                self._audio_paths.pop(cache_key, None)
+
+        audio_path = await self._fetch_audio(url, video_id, dur_opt)
+        with self._cache_lock:
+            self._audio_paths[cache_key] = audio_path
+        return audio_path
+
+    async def _fetch_audio(self, url: str, video_id: str, dur_opt: str) -> str:
+        """
+        Return cached audio from disk, or download (and trim) it
+        """
         output_base = os.path.join(MEDIA_DIR, video_id)
-        existing = f"{output_base}.{AUDIO_FORMAT}"
-        if os.path.exists(existing):
+        limit_sec = DURATION_LIMITS.get(dur_opt)
+
+        # Partial downloads are cached under their own name so they never stand in for the full audio
+        limited_base = f"{output_base}_{dur_opt}" if limit_sec else output_base
+        existing = f"{limited_base}.{AUDIO_FORMAT}"
+        if _is_nonempty_file(existing):
             print(f"Using existing audio file: {existing}")
             return existing
+        full_audio = f"{output_base}.{AUDIO_FORMAT}"
+        if limit_sec and _is_nonempty_file(full_audio):
+            return await self._process_duration_limit(full_audio, dur_opt)
 
         # Fetch basic video info
         video_info = {'duration': 0, 'title': 'Unknown'}
@@ -63,11 +165,22 @@ class YouTubeService:
         # Choose quality based on length
         quality = DEFAULT_AUDIO_QUALITY if duration_seconds <= LONG_VIDEO_THRESHOLD else LONG_AUDIO_QUALITY
 
+        # Fetch only the requested prefix when the duration is limited
+        if limit_sec:
+            try:
+                downloaded = await run_in_executor(
+                    self._download_executor,
+                    self._download_range_with_ytdlp, url, limited_base, limit_sec, quality
+                )
+                if os.path.exists(downloaded):
+                    return downloaded
+            except Exception as e:
+                print(f"yt-dlp range download failed: {e}")
+
         # Attempt download via pytube
         downloaded = None
         try:
-            loop = asyncio.get_event_loop()
-            downloaded = await loop.run_in_executor(None, self._download_with_pytube, url, output_base)
+            downloaded = await run_in_executor(self._download_executor, self._download_with_pytube, url, output_base)
         except Exception as e:
             print(f"Pytube download failed: {e}")
 
@@ -76,15 +189,13 @@ class YouTubeService:
 
         # Convert to requested audio format
         if not downloaded.endswith(f".{AUDIO_FORMAT}"):
-            audio = AudioSegment.from_file(downloaded)
             target = f"{output_base}.{AUDIO_FORMAT}"
-            audio.export(target, format=AUDIO_FORMAT, bitrate=quality)
+            await self._ffmpeg_convert(downloaded, target, quality)
             os.remove(downloaded)
             downloaded = target
 
         # Trim duration if needed
-        dur_opt = options.get('duration', 'full_video')
-        if dur_opt != 'full_video':
+        if limit_sec:
             downloaded = await self._process_duration_limit(downloaded, dur_opt)
 
         return downloaded
@@ -93,16 +204,57 @@ class YouTubeService:
         """
         Get basic video info via HTTP (with proxy)
         """
+        with self._cache_lock:
+            cached = self._info_cache.get(url)
+        if cached:
+            return cached
         try:
-            resp = requests.get(url, timeout=10, proxies=PROXIES)
-            resp.raise_for_status()
-            title_match = re.search(r'<title>(.*?)<\/title>', resp.text)
+            async with self._get_http().get(url) as resp:
+                resp.raise_for_status()
+                head = bytearray()
+                while len(head) < TITLE_SCAN_BYTES:
+                    chunk = await resp.content.read(TITLE_SCAN_BYTES - len(head))
+                    if not chunk:
+                        break
+                    head += chunk
+            text = head.decode(resp.charset or "utf-8", errors="replace")
+            title_match = _TITLE_RE.search(text)
             title = title_match.group(1).replace(' - YouTube', '') if title_match else 'Unknown'
-            return {'title': title, 'duration': 0}
+            info = {'title': title, 'duration': 0}
+            with self._cache_lock:
+                self._info_cache[url] = info
+            return info
         except Exception as e:
             print(f"Simple info HTTP error: {e}")
             return None
 
+    def _download_range_with_ytdlp(self, url: str, output_base: str, limit_sec: int, quality: str) -> str:
+        """
+        Download only the first limit_sec seconds of audio using yt-dlp
+        """
+        # yt-dlp is slow to import and only needed for limited-duration downloads
+        import yt_dlp
+        from yt_dlp.utils import download_range_func
+
+        ydl_opts = {
+            'format': 'bestaudio/best',
+            'outtmpl': f"{output_base}.%(ext)s",
+            'download_ranges': download_range_func(None, [(0, limit_sec)]),
+            'force_keyframes_at_cuts': True,
+            'postprocessors': [{
+                'key': 'FFmpegExtractAudio',
+                'preferredcodec': AUDIO_FORMAT,
+                'preferredquality': quality.rstrip('k')
+            }],
+            'quiet': True,
+            'noprogress': True
+        }
+        if PROXY_URL:
+            ydl_opts['proxy'] = PROXY_URL
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            ydl.download([url])
+        return f"{output_base}.{AUDIO_FORMAT}"
+
     def _download_with_pytube(self, url: str, output_base: str) -> str:
         """
         Download audio using pytube synchronously with proxy
@@ -119,10 +271,7 @@ class YouTubeService:
                           ' AppleWebKit/537.36 (KHTML, like Gecko)'
                           ' Chrome/91.0.4472.124 Safari/537.36'
         }
-        # Pick best audio stream
-        stream = yt.streams.filter(only_audio=True).order_by('abr').last()
-        if not stream:
-            stream = yt.streams.filter(progressive=True).order_by('resolution').first()
+        stream = self._select_audio_stream(yt)
         if not stream:
             raise Exception(f"No suitable audio stream found for {url}")
         path = stream.download(
@@ -131,24 +280,60 @@ class YouTubeService:
         )
         return path
 
+    def _select_audio_stream(self, yt: YouTube):
+        # yt.streams re-checks availability on every access, so read it once;
+        # a known audio itag avoids sorting the whole stream list
+        streams = yt.streams
+        for itag in PREFERRED_AUDIO_ITAGS:
+            stream = streams.get_by_itag(itag)
+            if stream:
+                return stream
+        stream = streams.filter(only_audio=True).order_by('abr').last()
+        if not stream:
+            stream = streams.filter(progressive=True).order_by('resolution').first()
+        return stream
+
+    async def _ffmpeg_convert(self, src: str, dst: str, bitrate: str) -> None:
+        """
+        Transcode audio with an ffmpeg subprocess; frames stream through ffmpeg, not Python memory
+        """
+        proc = await asyncio.create_subprocess_exec(
+            "ffmpeg", "-loglevel", "error", "-y", "-i", src, "-vn", "-c:a", "libmp3lame", "-b:a", bitrate, dst,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.DEVNULL
+        )
+        if await proc.wait() != 0:
+            if os.path.exists(dst):
+                os.remove(dst)
+            raise Exception(f"ffmpeg failed to convert {src}")
+
     async def _process_duration_limit(self, audio_path: str, duration: str) -> str:
         """
         Trim audio file to the specified duration
         """
-        limits = {
-            'first_5_minutes': 5*60*1000,
-            'first_10_minutes': 10*60*1000,
-            'first_30_minutes': 30*60*1000,
-            'first_60_minutes': 60*60*1000
-        }
-        limit_ms = limits.get(duration)
-        if not limit_ms:
+        limit_sec = DURATION_LIMITS.get(duration)
+        if not limit_sec:
             return audio_path
         trimmed_path = audio_path.replace(f".{AUDIO_FORMAT}", f"_{duration}.{AUDIO_FORMAT}")
-        if os.path.exists(trimmed_path):
+        if _is_nonempty_file(trimmed_path):
             return trimmed_path
-        loop = asyncio.get_event_loop()
-        sound = await loop.run_in_executor(None, AudioSegment.from_file, audio_path)
-        trimmed = sound[:limit_ms]
-        await loop.run_in_executor(None, lambda: trimmed.export(trimmed_path, format=AUDIO_FORMAT))
+        if not FFMPEG_AVAILABLE:
+            await run_in_thread(self._trim_with_pydub, audio_path, trimmed_path, limit_sec)
+            return trimmed_path
+        # Stream copy: no decode or re-encode, the frames are copied as-is
+        proc = await asyncio.create_subprocess_exec(
+            "ffmpeg", "-y", "-ss", "0", "-t", str(limit_sec), "-i", audio_path, "-c", "copy", trimmed_path,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.DEVNULL
+        )
+        if await proc.wait() != 0:
+            if os.path.exists(trimmed_path):
+                os.remove(trimmed_path)
+            raise Exception(f"ffmpeg failed to trim {audio_path}")
         return trimmed_path
+
+    def _trim_with_pydub(self, audio_path: str, trimmed_path: str, limit_sec: int) -> None:
+        from pydub import AudioSegment
+
+        sound = AudioSegment.from_file(audio_path)
+        sound[:limit_sec * 1000].export(trimmed_path, format=AUDIO_FORMAT)
@@ -3,127 +3,294 @@
 Transcription service with language detection using langdetect
 """
 import os
+import math
 import asyncio
-import json
 import time
-from typing import Dict, Any
+import tempfile
+from collections import Counter
+from typing import Dict, Any, Optional, Tuple
 
-from openai import AsyncOpenAI
-from pydub import AudioSegment
-from langdetect import detect
+import httpx
+import orjson
+from openai import AsyncOpenAI, NOT_GIVEN
+from langdetect import DetectorFactory, detect
+from langdetect.lang_detect_exception import LangDetectException
 
+from core.executor import run_in_thread
+from core.loop_local import LoopLocal
 from config.settings import (
     OPENAI_API_KEY,
     TRANSCRIPTION_MODEL,
+    TRANSCRIPTION_SHARD_SECONDS,
+    AUDIO_FORMAT,
     CACHE_DIR
 )
 
 SUPPORTED_LANGUAGES = {"en", "ar", "es", "it", "sv"}
 
+# verbose_json responses name the spoken language in English
+WHISPER_LANGUAGE_CODES = {
+    "english": "en",
+    "arabic": "ar",
+    "spanish": "es",
+    "italian": "it",
+    "swedish": "sv"
+}
+
+# Whisper only reads the last 224 tokens of a prompt; this is roughly that many characters' worth
+PROMPT_TAIL_CHARS = 800
+# A first shard with fewer words is likely intro music or silence, which makes a bad prompt
+PROMPT_MIN_WORDS = 50
+
+# langdetect is only a fallback and a prefix of the transcript is enough for it
+LANG_DETECT_SAMPLE_CHARS = 4000
+
+# Deterministic results, and language profiles loaded once at import rather than
+# lazily inside whichever task detects first
+DetectorFactory.seed = 0
+try:
+    detect("warmup")
+except LangDetectException:
+    pass
+
+# PyAV reads the container header in-process, without spawning ffprobe
+try:
+    import av
+    AV_AVAILABLE = True
+except ImportError:
+    AV_AVAILABLE = False
+
+# HTTP/2 lets parallel chunk uploads share one connection; httpx needs h2 for it
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+def _new_client() -> AsyncOpenAI:
+    return AsyncOpenAI(
+        api_key=OPENAI_API_KEY,
+        http_client=httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE,
+            limits=httpx.Limits(max_connections=32, max_keepalive_connections=16),
+            timeout=httpx.Timeout(60.0, connect=10.0)
+        )
+    )
+
+# One Whisper client and connection pool per event loop, shared by every
+# TranscriptionService. httpx connections belong to the loop that opened them,
+# and each Streamlit session thread runs its own loops
+_clients: LoopLocal[AsyncOpenAI] = LoopLocal(_new_client)
+
+def get_client() -> AsyncOpenAI:
+    return _clients.get()
+
 class TranscriptionService:
     def __init__(self):
-        self.client = AsyncOpenAI(api_key=OPENAI_API_KEY)
         self.cache_dir = os.path.join(CACHE_DIR, "transcripts")
         os.makedirs(self.cache_dir, exist_ok=True)
+        # Cached transcripts by video id -> mtime, listed once so cache checks
+        # are dict lookups; _save_to_cache keeps it current
+        self._cache_index: Dict[str, float] = {}
+        with os.scandir(self.cache_dir) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.endswith(".json"):
+                    self._cache_index[entry.name[:-5]] = entry.stat().st_mtime
 
-    async def transcribe(self, audio_path: str, video_id: str, options: Dict[str, Any]) -> Dict[str, Any]:
+    @property
+    def client(self) -> AsyncOpenAI:
+        return get_client()
+
+    async def close(self) -> None:
+        """Close the running loop's Whisper client before that loop finishes"""
+        client = _clients.pop()
+        if client is not None:
+            await client.close()
+
+    async def get_cached(self, video_id: str) -> Optional[Dict[str, Any]]:
+        if video_id not in self._cache_index:
+            return None
         cache_path = os.path.join(self.cache_dir, f"{video_id}.json")
-        if os.path.exists(cache_path):
-            with open(cache_path, "r") as f:
-                return json.load(f)
+        try:
+            return orjson.loads(await run_in_thread(_read_file, cache_path))
+        except FileNotFoundError:
+            # Removed from disk since the directory was listed
+            self._cache_index.pop(video_id, None)
+            return None
+
+    async def transcribe(self, audio_path: str, video_id: str, options: Dict[str, Any]) -> Dict[str, Any]:
+        cached = await self.get_cached(video_id)
+        if cached is not None:
+            return cached
 
-        audio = AudioSegment.from_file(audio_path)
-        total_duration_ms = len(audio)
+        total_duration_ms = await self._probe_duration_ms(audio_path)
 
         if total_duration_ms < 10 * 60 * 1000:
             result = await self._transcribe_simple(audio_path)
         else:
-            result = await self._transcribe_parallel(audio_path, video_id, options.get("parallelization", 3))
+            result = await self._transcribe_parallel(audio_path, total_duration_ms, options.get("parallelization", 3))
 
-        self._save_to_cache(video_id, result)
+        await self._save_to_cache(video_id, result)
         return result
 
     async def _transcribe_simple(self, file_path: str) -> Dict[str, Any]:
-        with open(file_path, "rb") as audio_file:
-            response = await self.client.audio.transcriptions.create(
-                model=TRANSCRIPTION_MODEL,
-                file=audio_file
-            )
+        response = await self.client.audio.transcriptions.create(
+            model=TRANSCRIPTION_MODEL,
+            file=await self._read_upload(file_path),
+            response_format="verbose_json"
+        )
 
         transcript_text = response.text
-        try:
-            detected_lang = detect(transcript_text)
-            language = detected_lang if detected_lang in SUPPORTED_LANGUAGES else "en"
-            if detected_lang not in SUPPORTED_LANGUAGES:
-                print(f"[langdetect] Detected unsupported language '{detected_lang}', defaulting to English.")
-        except Exception as e:
-            print(f"[langdetect] Detection failed: {e}")
-            language = "en"
+        language = self._resolve_language(getattr(response, "language", None), transcript_text)
 
         return {
             "transcript": transcript_text,
             "language": language
         }
 
-    async def _transcribe_parallel(self, audio_path: str, video_id: str, max_parallel: int) -> Dict[str, Any]:
-        chunk_size_ms = 5 * 60 * 1000
-        audio = AudioSegment.from_file(audio_path)
-        total_duration_ms = len(audio)
-        chunk_count = (total_duration_ms + chunk_size_ms - 1) // chunk_size_ms
-
-        temp_dir = os.path.join(self.cache_dir, f"temp_{video_id}")
-        os.makedirs(temp_dir, exist_ok=True)
+    async def _transcribe_parallel(self, audio_path: str, duration_ms: int, max_parallel: int) -> Dict[str, Any]:
+        num_chunks = math.ceil(duration_ms / (TRANSCRIPTION_SHARD_SECONDS * 1000))
+        ext = os.path.splitext(audio_path)[1]
 
         semaphore = asyncio.Semaphore(max_parallel)
-        tasks = []
 
-        async def process_chunk(i: int) -> str:
+        async def process_chunk(i: int, prompt: Optional[str] = None) -> Tuple[str, Optional[str]]:
+            # Shards are cut inside the semaphore so at most max_parallel are held in memory
             async with semaphore:
-                start = i * chunk_size_ms
-                end = min((i + 1) * chunk_size_ms, total_duration_ms)
-                chunk = audio[start:end]
-                chunk_path = os.path.join(temp_dir, f"chunk_{i}.mp3")
-                chunk.export(chunk_path, format="mp3")
-
-                try:
-                    with open(chunk_path, "rb") as audio_file:
-                        response = await self.client.audio.transcriptions.create(
-                            model=TRANSCRIPTION_MODEL,
-                            file=audio_file
-                        )
-                        return response.text
-                finally:
-                    os.remove(chunk_path)
-
-        for i in range(chunk_count):
-            tasks.append(process_chunk(i))
+                data = await _read_audio_shard(audio_path, i * TRANSCRIPTION_SHARD_SECONDS, TRANSCRIPTION_SHARD_SECONDS)
+                response = await self.client.audio.transcriptions.create(
+                    model=TRANSCRIPTION_MODEL,
+                    file=(f"chunk_{i}{ext}", data, "audio/mpeg"),
+                    response_format="verbose_json",
+                    prompt=prompt or NOT_GIVEN
+                )
+                return response.text, getattr(response, "language", None)
 
-        results = await asyncio.gather(*tasks)
-        full_transcript = " ".join(results)
+        # Every shard starts at once except shard 1, which waits for shard 0 and is
+        # primed with its real closing text. Chaining each shard to its predecessor
+        # would serialize every upload, so later shards go unprimed. Language is
+        # left to Whisper per chunk so the vote below stays independent
+        first = asyncio.ensure_future(process_chunk(0))
 
-        try:
-            detected_lang = detect(full_transcript)
-            language = detected_lang if detected_lang in SUPPORTED_LANGUAGES else "en"
-            if detected_lang not in SUPPORTED_LANGUAGES:
-                print(f"[langdetect] Detected unsupported language '{detected_lang}' in long transcript, defaulting to English.")
-        except Exception as e:
-            print(f"[langdetect] Detection failed on long transcript: {e}")
-            language = "en"
+        async def process_second() -> Tuple[str, Optional[str]]:
+            first_text, _ = await first
+            prompt = first_text[-PROMPT_TAIL_CHARS:] if len(first_text.split()) >= PROMPT_MIN_WORDS else None
+            return await process_chunk(1, prompt)
 
-        try:
-            os.rmdir(temp_dir)
-        except:
-            pass
+        tasks = [first]
+        if num_chunks > 1:
+            tasks.append(process_second())
+        tasks.extend(process_chunk(i) for i in range(2, num_chunks))
+
+        results = await asyncio.gather(*tasks)
+        full_transcript = " ".join(text for text, _ in results)
+
+        # The language Whisper reported for most chunks
+        chunk_languages = Counter(lang for _, lang in results if lang)
+        whisper_language = chunk_languages.most_common(1)[0][0] if chunk_languages else None
+        language = self._resolve_language(whisper_language, full_transcript)
 
         return {
             "transcript": full_transcript,
             "language": language
         }
 
-    def _save_to_cache(self, video_id: str, result: Dict[str, Any]) -> None:
+    def _resolve_language(self, whisper_language: Optional[str], text: str) -> str:
+        # Prefer the language Whisper reported; detect locally on a prefix only if it is missing
+        if whisper_language:
+            detected_lang = WHISPER_LANGUAGE_CODES.get(whisper_language.lower(), whisper_language.lower())
+        else:
+            try:
+                detected_lang = detect(text[:LANG_DETECT_SAMPLE_CHARS])
+            except LangDetectException as e:
+                print(f"[langdetect] Detection failed: {e}")
+                return "en"
+
+        if detected_lang not in SUPPORTED_LANGUAGES:
+            print(f"[langdetect] Detected unsupported language '{detected_lang}', defaulting to English.")
+            return "en"
+        return detected_lang
+
+    async def _probe_duration_ms(self, path: str) -> int:
+        # PyAV and ffprobe read the container header only; decoding with pydub
+        # just to measure length costs a full pass over the audio
+        if AV_AVAILABLE:
+            try:
+                duration_ms = await run_in_thread(_container_duration_ms, path)
+                if duration_ms is not None:
+                    return duration_ms
+            except av.FFmpegError as e:
+                print(f"PyAV could not read duration of {path}: {e}")
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                "ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", path,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL
+            )
+            stdout, _ = await proc.communicate()
+            return int(float(stdout.decode().strip()) * 1000)
+        except (OSError, ValueError):
+            print(f"ffprobe could not read duration of {path}, decoding instead")
+            return await run_in_thread(_decoded_duration_ms, path)
+
+    async def _read_upload(self, path: str) -> Tuple[str, bytes, str]:
+        # Disk reads happen on the thread pool; the SDK gets the bytes as a (name, data, mime) upload
+        data = await run_in_thread(_read_file, path)
+        return os.path.basename(path), data, "audio/mpeg"
+
+    async def _save_to_cache(self, video_id: str, result: Dict[str, Any]) -> None:
         cache_path = os.path.join(self.cache_dir, f"{video_id}.json")
         result["video_id"] = video_id
         result["timestamp"] = time.time()
 
-        with open(cache_path, "w") as f:
-            json.dump(result, f)
+        await run_in_thread(_write_file_atomic, cache_path, orjson.dumps(result))
+        self._cache_index[video_id] = result["timestamp"]
+
+
+async def _read_audio_shard(audio_path: str, start_sec: int, shard_sec: int) -> bytes:
+    # Stream copy (no decode or re-encode) into stdout, so shards never touch the disk
+    proc = await asyncio.create_subprocess_exec(
+        "ffmpeg", "-ss", str(start_sec), "-t", str(shard_sec), "-i", audio_path,
+        "-c", "copy", "-f", AUDIO_FORMAT, "pipe:1",
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.DEVNULL
+    )
+    data, _ = await proc.communicate()
+    if proc.returncode != 0:
+        raise Exception(f"ffmpeg failed to cut {audio_path} at {start_sec}s")
+    return data
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _write_file_atomic(path: str, data: bytes) -> None:
+    # Readers see either the old file or the complete new one, never a partial write;
+    # a unique temp name keeps concurrent writers of the same file apart
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _container_duration_ms(path: str) -> Optional[int]:
+    with av.open(path) as container:
+        if container.duration is None:
+            return None
+        # container.duration is in av.time_base units (microseconds)
+        return int(container.duration * 1000 / av.time_base)
+
+
+def _decoded_duration_ms(path: str) -> int:
+    from pydub import AudioSegment
+
+    return len(AudioSegment.from_file(path))
\ No newline at end of file